@@ -0,0 +1,204 @@
+# 离线基准测试：生成与真实输入结构相同的合成数据，在模拟的连接池上运行论文和实体导入流程
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+from fake_nebula import FakeConnectionPool, FakeGraph
+from host_pool import BalancedConnectionPool
+from vid_registry import VID_SCHEMES
+import data_in_1
+import data_in_entity_1
+import pipeline
+import settings
+
+
+# 生成合成输入：论文信息表_1.xlsx、output.json 和 实体.xlsx
+def generate_inputs(data_dir, papers=1000, authors_per_paper=5, refs_per_paper=30, keywords_per_paper=5,
+                    entities=300, related_per_entity=5, unknown_ref_ratio=0.1, abstract_chars=600, seed=0):
+    rng = random.Random(seed)
+    words = [f'词{i}' for i in range(2000)]
+    journals = [f'期刊{i}' for i in range(max(1, papers // 50))]
+    author_pool = [f'作者{i}' for i in range(max(1, papers * authors_per_paper // 3))]
+    org_pool = [f'单位{i}' for i in range(max(1, papers // 10))]
+    fund_pool = [f'基金{i}' for i in range(max(1, papers // 5))]
+    titles = [f'论文{i} ' + ' '.join(rng.sample(words, 3)) for i in range(papers)]
+
+    rows = []
+    records = []
+    for i, title in enumerate(titles):
+        rows.append({
+            '论文标题': title,
+            '期刊名称': rng.choice(journals),
+            '摘要': ''.join(rng.choice(words) for _ in range(abstract_chars // 3)),
+            '关键词': ';'.join(rng.sample(words, keywords_per_paper)),
+            '发表时间': f'20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}',
+            '专辑': rng.choice(['信息科技', '工程科技Ⅱ辑', '基础科学']),
+            '专题': '；'.join(rng.sample(['计算机软件', '自动化技术', '互联网技术', '电信技术'], 2)),
+            '分类号': ','.join(f'TP{rng.randint(1, 400)}' for _ in range(2)),
+            '下载量': rng.randint(0, 5000),
+            '页数': f'{rng.randint(1, 30)}页',
+            '引用量': rng.randint(0, 300),
+        })
+        references = []
+        for _ in range(refs_per_paper):
+            if rng.random() < unknown_ref_ratio:
+                references.append({'题目': f'未收录论文{rng.randint(0, papers * 10)}'})
+            else:
+                references.append({'题目': rng.choice(titles)})
+        records.append({
+            '题目': title,
+            '作者': [{'姓名': rng.choice(author_pool), '单位': rng.sample(org_pool, min(2, len(org_pool)))}
+                   for _ in range(authors_per_paper)],
+            '基金资助': [{'项目名称': rng.choice(fund_pool), '项目号': str(rng.randint(10000, 99999))}],
+            '参考文献': references,
+        })
+
+    entity_rows = []
+    for i in range(entities):
+        related = [rng.choice(titles) for _ in range(related_per_entity)]
+        entity_rows.append({'实体': f'实体{i}', '分数': rng.randint(0, 100), '关联论文': str(related)})
+
+    pd.DataFrame(rows).to_excel(os.path.join(data_dir, '论文信息表_1.xlsx'), index=False)
+    pd.DataFrame(entity_rows).to_excel(os.path.join(data_dir, '实体.xlsx'), index=False)
+    with open(os.path.join(data_dir, 'output.json'), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+def _peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，是进程启动以来的峰值
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_phase(name, graph, func, verbose):
+    inserted_before = sum(graph.statement_counts.get(k, 0) for k in graph.statement_counts if k.startswith('INSERT'))
+    round_trips_before = graph.round_trips
+    vertices_before, edges_before = graph.row_counts()
+    start = time.perf_counter()
+    if verbose:
+        func()
+    else:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            func()
+    elapsed = time.perf_counter() - start
+    vertices, edges = graph.row_counts()
+    rows = (sum(vertices.values()) - sum(vertices_before.values())
+            + sum(edges.values()) - sum(edges_before.values()))
+    statements = sum(graph.statement_counts.get(k, 0) for k in graph.statement_counts if k.startswith('INSERT'))
+    statements -= inserted_before
+    return {
+        'phase': name,
+        'seconds': elapsed,
+        'rows': rows,
+        'insert_statements': statements,
+        'round_trips': graph.round_trips - round_trips_before,
+        'rows_per_second': rows / elapsed if elapsed else 0,
+        'statements_per_second': statements / elapsed if elapsed else 0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_benchmark(args):
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        generate_inputs(data_dir, papers=args.papers, authors_per_paper=args.authors, refs_per_paper=args.refs,
+                        keywords_per_paper=args.keywords, entities=args.entities,
+                        related_per_entity=args.related, seed=args.seed)
+        results.append({'phase': 'generate_inputs', 'seconds': time.perf_counter() - start,
+                        'peak_rss_mb': _peak_rss_mb()})
+
+        graph = FakeGraph(latency=args.latency_ms / 1000, latency_per_kb=args.latency_per_kb_ms / 1000,
+                          error_rate=args.error_rate, seed=args.seed, job_seconds=args.job_ms / 1000,
+                          parameters=not args.no_server_parameters)
+        pool = FakeConnectionPool(graph)
+        balancer = None
+        if args.host_latency_ms:
+            # 多个模拟的 graphd 共用同一个 FakeGraph，各自有不同的额外延迟，down_hosts 中的主机从一开始就无法连接
+            latencies = [float(x) for x in args.host_latency_ms.split(',')]
+            hosts = [(f'graphd{i}', 9669) for i in range(len(latencies))]
+            fake_pools = {address: FakeConnectionPool(graph, latency / 1000, f'{address[0]}:{address[1]}')
+                          for address, latency in zip(hosts, latencies)}
+            pool = balancer = BalancedConnectionPool(hosts, pool_factory=fake_pools.__getitem__, check_interval=0.5)
+            for i in (int(x) for x in args.down_hosts.split(',') if x.strip()):
+                fake_pools[hosts[i]].down = True
+        if args.pipeline:
+            # 一个入口按阶段依赖并发执行论文和实体导入
+            results.append(_run_phase('pipeline', graph, lambda: pipeline.run_pipeline(
+                pool, data_dir=data_dir, executor_workers=args.workers, clean_workers=args.clean_workers,
+                vid_scheme=args.vid_scheme), args.verbose))
+        else:
+            results.append(_run_phase('import_papers', graph, lambda: data_in_1.import_papers(
+                pool, data_dir=data_dir, executor_workers=args.workers, clean_workers=args.clean_workers,
+                vid_scheme=args.vid_scheme), args.verbose))
+            results.append(_run_phase('import_entities', graph, lambda: data_in_entity_1.import_entities(
+                pool, data_dir=data_dir, executor_workers=args.workers, vid_scheme=args.vid_scheme), args.verbose))
+    hosts = None
+    if balancer is not None:
+        hosts = balancer.stats()
+        balancer.close()
+    return {'params': vars(args), 'phases': results, 'statement_counts': graph.statement_counts,
+            'injected_errors': graph.injected_errors, 'hosts': hosts}
+
+
+def print_report(report):
+    print(f"{'阶段':<16}{'耗时(秒)':>10}{'行数':>10}{'INSERT语句':>12}{'往返次数':>10}{'行/秒':>10}{'语句/秒':>10}{'峰值RSS(MB)':>13}")
+    for p in report['phases']:
+        print(f"{p['phase']:<16}{p['seconds']:>10.2f}{p.get('rows', ''):>10}{p.get('insert_statements', ''):>12}"
+              f"{p.get('round_trips', ''):>10}{p.get('rows_per_second', 0):>10.0f}"
+              f"{p.get('statements_per_second', 0):>10.1f}{p['peak_rss_mb']:>13.1f}")
+    if report['injected_errors']:
+        print(f"注入的暂时性错误: {report['injected_errors']} 次")
+    if report['hosts']:
+        print("各 graphd 的请求分布:")
+        for h in report['hosts']:
+            latency = f"{h['latency_ms']:.1f}" if h['latency_ms'] is not None else '-'
+            print(f"  {h['host']:<16}请求 {h['requests']:>6} 次，失败 {h['errors']:>4} 次，"
+                  f"平均延迟 {latency} 毫秒，{'正常' if h['healthy'] else '暂停'}")
+    print("各类语句往返次数:")
+    for kind, count in sorted(report['statement_counts'].items(), key=lambda kv: -kv[1]):
+        print(f"  {kind:<40}{count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在模拟的 Nebula 连接池上对导入流程做离线基准测试")
+    parser.add_argument('--papers', type=int, default=1000, help="论文数量")
+    parser.add_argument('--authors', type=int, default=5, help="每篇论文的作者数")
+    parser.add_argument('--refs', type=int, default=30, help="每篇论文的参考文献数")
+    parser.add_argument('--keywords', type=int, default=5, help="每篇论文的关键词数")
+    parser.add_argument('--entities', type=int, default=300, help="关键技术实体数量")
+    parser.add_argument('--related', type=int, default=5, help="每个实体的关联论文数")
+    parser.add_argument('--workers', type=int, default=8, help="并行写入的会话数")
+    parser.add_argument('--clean-workers', type=int, default=settings.clean_workers,
+                        help="文本清理进程数，不大于 1 时在主进程中串行清理")
+    parser.add_argument('--latency-ms', type=float, default=1.0, help="模拟的每次调用延迟（毫秒）")
+    parser.add_argument('--latency-per-kb-ms', type=float, default=0.05, help="模拟的每 KB 语句额外延迟（毫秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="INSERT 语句返回暂时性错误的概率，用于检验重试")
+    parser.add_argument('--host-latency-ms', default='',
+                        help="模拟多个 graphd 时各主机的额外延迟（毫秒），逗号分隔，例如 1,1,20；为空时只有一个主机")
+    parser.add_argument('--down-hosts', default='', help="模拟多个 graphd 时无法连接的主机序号，逗号分隔")
+    parser.add_argument('--vid-scheme', choices=VID_SCHEMES, default=settings.vid_scheme, help="VID 方案")
+    parser.add_argument('--job-ms', type=float, default=50.0, help="模拟的统计作业执行时间（毫秒）")
+    parser.add_argument('--no-server-parameters', action='store_true',
+                        help="模拟不支持参数化语句的服务端，检验改用字面量语句的回退")
+    parser.add_argument('--pipeline', action='store_true', help="通过 pipeline.py 运行，互不依赖的阶段并发执行")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子，保证多次运行的输入相同")
+    parser.add_argument('--json', help="把结果写入指定的 JSON 文件")
+    parser.add_argument('--verbose', action='store_true', help="显示导入流程自身的输出")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# 增量/可恢复导入：记录每篇论文输入数据的指纹，只有所在分段全部写入成功后才保存
+import hashlib
+import json
+import sqlite3
+import time
+
+
+# 输入行指纹：Excel 原始行与对应的 output.json 记录一起计算
+def row_fingerprint(excel_row, json_record):
+    payload = json.dumps([list(excel_row), json_record], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ImportCheckpoint:
+    # 一个导入阶段（如 paper、reference）的指纹和检查点，多个阶段可以共用同一个数据库文件
+    def __init__(self, path, stage):
+        self.stage = stage
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS fingerprints ('
+                          'stage TEXT NOT NULL, key TEXT NOT NULL, fingerprint TEXT NOT NULL, '
+                          'PRIMARY KEY (stage, key))')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS checkpoints ('
+                          'stage TEXT PRIMARY KEY, segment INTEGER NOT NULL, rows INTEGER NOT NULL, updated_at REAL NOT NULL)')
+        # 已保存指纹、但有引用对象尚未找到的 key（如参考文献标题），JSON 列表
+        self.conn.execute('CREATE TABLE IF NOT EXISTS unresolved ('
+                          'stage TEXT NOT NULL, key TEXT NOT NULL, items TEXT NOT NULL, PRIMARY KEY (stage, key))')
+        self.conn.commit()
+        self.fingerprints = dict(self.conn.execute('SELECT key, fingerprint FROM fingerprints WHERE stage = ?', (stage,)))
+        self.unresolved = {key: json.loads(items) for key, items in
+                           self.conn.execute('SELECT key, items FROM unresolved WHERE stage = ?', (stage,))}
+        row = self.conn.execute('SELECT segment, rows FROM checkpoints WHERE stage = ?', (stage,)).fetchone()
+        self.segment, self.rows = row if row else (0, 0)
+        self.pending = {}   # 当前分段中已生成语句、尚未确认写入的 key -> 指纹
+        self.pending_unresolved = {}  # 当前分段中的 key -> 仍未找到的引用对象
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_unchanged(self, key, fingerprint):
+        if self.fingerprints.get(key) == fingerprint:
+            self.skipped += 1
+            return True
+        return False
+
+    def is_known(self, key):
+        # 以前导入过但内容有变化，需要覆盖写入
+        return key in self.fingerprints
+
+    def mark(self, key, fingerprint, unresolved=None):
+        # unresolved 为仍未找到的引用对象，随指纹一起保存，之后的运行只需重试这些对象
+        self.pending[key] = fingerprint
+        if unresolved is not None:
+            self.pending_unresolved[key] = list(unresolved)
+
+    def commit_segment(self, failed):
+        # 分段内的语句全部执行完成后调用；有失败的行时不保存指纹，下次运行会重新生成这些论文
+        if failed:
+            print(f"检查点: 第 {self.segment + 1} 段有 {failed} 行写入失败，本段 {len(self.pending)} 篇论文将在下次运行时重试")
+        else:
+            self.conn.executemany('INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)',
+                                  [(self.stage, key, fp) for key, fp in self.pending.items()])
+            self.conn.executemany('DELETE FROM unresolved WHERE stage = ? AND key = ?',
+                                  [(self.stage, key) for key, items in self.pending_unresolved.items() if not items])
+            self.conn.executemany('INSERT OR REPLACE INTO unresolved VALUES (?, ?, ?)',
+                                  [(self.stage, key, json.dumps(items, ensure_ascii=False))
+                                   for key, items in self.pending_unresolved.items() if items])
+            for key, items in self.pending_unresolved.items():
+                if items:
+                    self.unresolved[key] = items
+                else:
+                    self.unresolved.pop(key, None)
+            # 只重试了未找到的引用对象的 key 指纹不变，不重复计数
+            self.rows += sum(1 for key, fp in self.pending.items() if self.fingerprints.get(key) != fp)
+            self.fingerprints.update(self.pending)
+        self.segment += 1
+        self.conn.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)',
+                          (self.stage, self.segment, self.rows, time.time()))
+        self.conn.commit()
+        self.pending = {}
+        self.pending_unresolved = {}
+
+    def close(self):
+        self.conn.close()
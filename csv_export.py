@@ -0,0 +1,186 @@
+# 批量导出后端：不执行语句，而是把批次流中的顶点和边去重后写入每个标签/边类型一个 CSV 文件，
+# 并生成 nebula-importer 的配置文件，用于首次全量导入等离线场景
+import csv
+import json
+import os
+
+from dedup import Int64Set, key64
+from nebula_batch import VERTEX
+from nebula_executor import Barrier
+from schema import SPACE_OPTIONS, schema_statements
+
+
+# 属性定义文本，例如 "title string, page int" -> [('title', 'string'), ('page', 'int')]
+def parse_props(props):
+    return [tuple(p.split()[:2]) for p in props.split(',') if p.strip()]
+
+
+class CsvExporter:
+    # 与 ParallelExecutor 相同的用法（上下文管理器 + execute_stream），可以直接替换执行器。
+    # 同一个导出器可以跨多个阶段使用：文件在第一次写入时清空，之后的阶段追加写入，去重状态也会保留
+    def __init__(self, output_dir, space, tags, edges, tag_indexes=None, space_options=SPACE_OPTIONS,
+                 config_name='importer.yaml', address='127.0.0.1:9669', user='root', password='nebula',
+                 batch_size=256, concurrency=10):
+        self.output_dir = output_dir
+        self.space = space
+        self.tags = tags
+        self.edges = edges
+        self.tag_indexes = tag_indexes or {}
+        self.space_options = space_options
+        self.config_path = os.path.join(output_dir, config_name)
+        self.address = address
+        self.user = user
+        self.password = password
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.columns = {}   # (VERTEX|EDGE, 名称) -> 文件中的属性列，第一次写入时确定
+        self.seen = {}      # (VERTEX|EDGE, 名称) -> 已写入的 VID 或 (起点, 终点) 的 64 位哈希键，用于去重
+        self.files = {}     # (VERTEX|EDGE, 名称) -> (文件对象, csv.writer)
+        self.rows = 0
+        self.duplicates = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        pass
+
+    def close(self):
+        for f, _ in self.files.values():
+            f.close()
+        self.files = {}
+        self.write_config()
+
+    def path(self, kind, name):
+        return os.path.join(self.output_dir, f'{name}.csv')
+
+    def _writer(self, kind, name, props):
+        key = (kind, name)
+        columns = [p.strip() for p in props.split(',') if p.strip()]
+        if key not in self.columns:
+            # 本次导出第一次写入该文件：清空旧内容并写表头
+            self.columns[key] = columns
+            self.seen[key] = Int64Set()
+            f = open(self.path(kind, name), 'w', encoding='utf-8', newline='')
+            writer = csv.writer(f)
+            writer.writerow((['vid'] if kind == VERTEX else ['src', 'dst']) + columns)
+            self.files[key] = (f, writer)
+        elif self.columns[key] != columns:
+            raise ValueError(f"{name} 的属性列表不一致: {self.columns[key]} 与 {columns}")
+        elif key not in self.files:
+            f = open(self.path(kind, name), 'a', encoding='utf-8', newline='')
+            self.files[key] = (f, csv.writer(f))
+        return self.files[key][1]
+
+    def write_batch(self, batch):
+        key = (batch.kind, batch.name)
+        writer = self._writer(batch.kind, batch.name, batch.props)
+        seen = self.seen[key]
+        for ids, values in batch.rows:
+            # 与 IF NOT EXISTS 相同，同一顶点或同一条边只保留第一次出现的数据
+            if not seen.add(key64(*ids)):
+                self.duplicates += 1
+                continue
+            writer.writerow([*ids, *('' if v is None else v for v in values)])
+            self.rows += 1
+
+    def execute(self, batches):
+        return self.execute_stream(batches)
+
+    def execute_stream(self, batches, source_progress=None):
+        # 顺序写入，检查点之前的行都已经写入文件，没有失败的行
+        rows_before = self.rows
+        for batch in batches:
+            if isinstance(batch, Barrier):
+                for f, _ in self.files.values():
+                    f.flush()
+                batch.callback(0)
+                continue
+            self.write_batch(batch)
+        print(f"已导出 {self.rows - rows_before} 行到 {self.output_dir}，累计去重跳过 {self.duplicates} 行")
+        return self.rows - rows_before, 0
+
+    def write_config(self):
+        # nebula-importer（配置版本 v2）的 YAML 配置；字符串统一用 JSON 格式书写，也是合法的 YAML
+        q = lambda s: json.dumps(s, ensure_ascii=False)
+        commands = schema_statements(self.space, self.tags, self.edges, self.tag_indexes, self.space_options)
+        lines = [
+            'version: v2',
+            f'description: {q(f"由导入脚本导出的 {self.space} 数据")}',
+            'removeTempFiles: false',
+            'clientSettings:',
+            '  retry: 3',
+            f'  concurrency: {self.concurrency}',
+            '  channelBufferSize: 128',
+            f'  space: {self.space}',
+            '  connection:',
+            f'    user: {q(self.user)}',
+            f'    password: {q(self.password)}',
+            f'    address: {q(self.address)}',
+            '  postStart:',
+            '    commands: |',
+        ]
+        lines += [f'      {stmt};' for stmt in commands]
+        lines += [
+            '    afterPeriod: 20s',
+            'logPath: ./err/importer.log',
+            'files:',
+        ]
+        # INT64 图空间的 VID 列是整数
+        vid_type = ['          type: int'] if 'INT64' in self.space_options.upper() else []
+        # 顶点文件排在边文件前面
+        for (kind, name), columns in sorted(self.columns.items(), key=lambda kv: kv[0][0] != VERTEX):
+            declared = dict(parse_props((self.tags if kind == VERTEX else self.edges).get(name, '')))
+            offset = 1 if kind == VERTEX else 2
+            lines += [
+                f'  - path: {q(f"./{name}.csv")}',
+                f'    failDataPath: {q(f"./err/{name}.csv")}',
+                f'    batchSize: {self.batch_size}',
+                '    type: csv',
+                '    csv:',
+                '      withHeader: true',
+                '      withLabel: false',
+                '    schema:',
+            ]
+            if kind == VERTEX:
+                lines += [
+                    '      type: vertex',
+                    '      vertex:',
+                    '        vid:',
+                    '          index: 0',
+                    *vid_type,
+                    '        tags:',
+                    f'          - name: {name}',
+                    '            props:',
+                ]
+                indent = '              '
+            else:
+                lines += [
+                    '      type: edge',
+                    '      edge:',
+                    f'        name: {name}',
+                    '        withRanking: false',
+                    '        srcVID:',
+                    '          index: 0',
+                    *vid_type,
+                    '        dstVID:',
+                    '          index: 1',
+                    *vid_type,
+                    '        props:',
+                ]
+                indent = '          '
+            if not columns:
+                lines[-1] += ' []'
+            for i, column in enumerate(columns):
+                lines += [
+                    f'{indent}- name: {column}',
+                    f'{indent}  type: {declared.get(column, "string")}',
+                    f'{indent}  index: {i + offset}',
+                ]
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
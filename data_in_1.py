@@ -1,453 +1,351 @@
-from nebula3.gclient.net import ConnectionPool
 from nebula3.Config import Config
-import numpy as np
-import pandas as pd
-import json
-import unicodedata
-import re
+import os
+import sys
+import settings
+from title_index import TitleIndex
+from preprocess import preprocess_papers, group_by_row, parallel_map, prepare_paper
+from checkpoint import ImportCheckpoint
+from nebula_executor import Barrier
+from loaders import read_excel_cached, iter_json_records
+from schema import PAPER_TAGS, PAPER_EDGES, PAPER_TAG_INDEXES
+from load_context import LoadContext
+from verify import check
+from dedup import VertexIdSet
+from host_pool import BalancedConnectionPool
 
-def read_paper_info(paper):
-    try:
 
-        # Extract the required sections
-        paper_info = {
-            "题目": paper.get("题目", ""),
-            "作者": paper.get("作者", []),
-            "基金资助": paper.get("基金资助", []),
-            "参考文献": paper.get("参考文献", [])
+class PaperImport:
+    # 论文导入的各个阶段，按 load_inputs → import_metadata → build_title_index → import_references 的顺序执行。
+    # 输入文件只解析一次：元数据阶段顺带保存每篇论文的参考文献标题，参考文献阶段不再重新读取和清理 output.json
+    def __init__(self, ctx, incremental=settings.incremental, checkpoint_every=settings.checkpoint_every,
+                 clean_workers=settings.clean_workers, clean_chunk_size=settings.clean_chunk_size):
+        self.ctx = ctx
+        self.incremental = incremental
+        self.checkpoint_every = checkpoint_every
+        self.clean_workers = clean_workers
+        self.clean_chunk_size = clean_chunk_size
+        # output.json 按记录流式解析，不把整个 JSON 树读入内存
+        self.papers_path = ctx.path(settings.paper_json)
+        # 导入指纹和检查点
+        self.checkpoint_path = ctx.path('import_checkpoint.db')
+        if ctx.exporter is not None:
+            # 导出模式总是全量导出；检查点保存在导出目录中，不会把未导入的论文记为已完成
+            self.incremental = False
+            self.checkpoint_path = os.path.join(ctx.exporter.output_dir, 'import_checkpoint.db')
+        # 追踪已插入的顶点，避免重复；按登记表中的编号记录，不再保存名称
+        self.inserted_vertices = {
+            entity_type: VertexIdSet(ctx.vid_registry, entity_type)
+            for entity_type in ('journal', 'author', 'organization', 'key_word', 'classification', 'topic', 'album', 'fund')
         }
-        
-        return paper_info
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
-    
-data_df = pd.read_excel("/root/VscodeProject/PythonProject/nebula_data/论文信息表_1.xlsx", 
-                      usecols=['论文标题', '期刊名称', '摘要', '关键词', '发表时间', '专辑', '专题', '分类号', '下载量', '页数', '引用量'])
-with open('/root/VscodeProject/PythonProject/nebula_data/output.json', 'r', encoding='utf-8') as file:
-    papers = json.load(file)
-# 处理数据并插入到数据库
-# 预处理函数：处理字符串以便可以安全地在nGQL查询中使用
-def preprocess_string(s):
-    if pd.isna(s) or s == "无":
-        return ""
-    # 转为字符串并去除引号，防止SQL注入
-    return str(s).replace("'", "''").strip()
+        # 已解析的论文行数，用于估算总语句数
+        self.progress = {'papers': 0}
+        # 元数据阶段记下的 (论文标题, 输入指纹, 参考文献标题)，参考文献阶段结束后释放
+        self.references = []
+        self.title_index = None
 
-# 处理页数字段，提取数字部分
-def extract_page_number(page_str):
-    if pd.isna(page_str):
-        return "0"
-    # 使用正则表达式提取数字部分
-    match = re.search(r'\d+', str(page_str))
-    if match:
-        return match.group()
-    return "0"
+    def load_inputs(self):
+        metrics = self.ctx.metrics
+        # Excel 只在文件变化时重新解析，其余时候读取缓存的快照
+        with metrics.timer('read_excel'):
+            self.data_df = read_excel_cached(self.ctx.path(settings.paper_excel),
+                                             usecols=['论文标题', '期刊名称', '摘要', '关键词', '发表时间', '专辑', '专题', '分类号', '下载量', '页数', '引用量'])
+        # 按列预处理论文信息表，多值字段拆成 (行, 名称) 长表后按行聚合
+        with metrics.timer('preprocess'):
+            self.paper_df, self.multi_values = preprocess_papers(self.data_df)
+            self.keywords_by_row = group_by_row(self.multi_values['key_word'])
+            self.classifications_by_row = group_by_row(self.multi_values['classification'])
+            self.topics_by_row = group_by_row(self.multi_values['topic'])
+            self.albums_by_row = group_by_row(self.multi_values['album'])
 
+    def assign_vids(self):
+        # 预先为表格中的实体批量分配VID，作者、单位和基金来自JSON，逐篇分配
+        paper_df, vid_registry = self.paper_df, self.ctx.vid_registry
+        with self.ctx.metrics.timer('vid_assignment'):
+            vid_registry.get_or_assign_many('paper', paper_df['title'])
+            vid_registry.get_or_assign_many('journal', paper_df.loc[paper_df['journal'] != "", 'journal'])
+            for entity_type, long_frame in self.multi_values.items():
+                vid_registry.get_or_assign_many(entity_type, long_frame['name'])
 
-# 分割关键词
-def split_keywords(keywords_str):
-    if pd.isna(keywords_str) or keywords_str == "无":
-        return []
-    return [kw.strip() for kw in re.split('[；;，,、]', keywords_str) if kw.strip()]
+    # 元数据阶段的批次：逐篇论文生成语句，每处理完一篇论文就交出已经装满的批次，边生成边执行
+    def _paper_batches(self, paper_checkpoint, batcher):
+        # 循环中用到的状态取为局部变量
+        data_df, paper_df, metrics = self.data_df, self.paper_df, self.ctx.metrics
+        vid_registry, generate_vid = self.ctx.vid_registry, self.ctx.vid_registry.get_or_assign
+        inserted_vertices, parse_progress = self.inserted_vertices, self.progress
+        keywords_by_row, classifications_by_row = self.keywords_by_row, self.classifications_by_row
+        topics_by_row, albums_by_row = self.topics_by_row, self.albums_by_row
+        incremental, checkpoint_every = self.incremental, self.checkpoint_every
+        papers_path, clean_workers, clean_chunk_size = self.papers_path, self.clean_workers, self.clean_chunk_size
+        # 输入指纹和需要逐篇清理的文本在进程池中按块计算，结果按原顺序返回
+        prepared = parallel_map(prepare_paper, zip(data_df.itertuples(index=False, name=None),
+                                                   iter_json_records(papers_path), paper_df['abstract']),
+                                workers=clean_workers, chunk_size=clean_chunk_size)
+        # 遍历预处理后的每一行数据
+        for row, (fingerprint, paper_abstract, funds, authors, references) in zip(paper_df.itertuples(), metrics.timed_iter('clean_text', prepared)):
+            parse_progress['papers'] += 1
+            paper_title = row.title
+            # 参考文献标题留给参考文献阶段使用，标题驻留后重复出现的参考文献只保存一份
+            self.references.append((paper_title, fingerprint, tuple(sys.intern(t) for t in references)))
+            # 输入指纹未变化的论文上次已经完整导入，直接跳过
+            if incremental and paper_checkpoint.is_unchanged(paper_title, fingerprint):
+                continue
+            # 以前导入过但内容有变化的论文需要覆盖论文顶点
+            overwrite = incremental and paper_checkpoint.is_known(paper_title)
+            paper_publish_time = row.release_time
+            paper_downloads = row.downloads
+            paper_pages = row.pages
+            paper_citations = row.citations
 
-# 分割分类号
-def split_classification(class_str):
-    if pd.isna(class_str) or class_str == "无":
-        return []
-    return [cls.strip() for cls in re.split('[；;，,、]', class_str) if cls.strip()]
+            journal_name = row.journal
 
-# 分割单位
-def split_organizations(org_str):
-    if pd.isna(org_str) or org_str == "无":
-        return []
-    return [org.strip() for org in re.split('[；;，,、]', org_str) if org.strip()]
+            # 生成论文顶点ID
+            paper_vid = generate_vid('paper', paper_title)
 
-# 分割专题
-def split_topics(topic_str):
-    if pd.isna(topic_str) or topic_str == "无":
-        return []
-    return [topic.strip() for topic in re.split('[；;，,、]', topic_str) if topic.strip()]
+            # 处理论文顶点
+            batcher.add_vertex('paper', 'title, abstract, release_time, download_times, page, quote_times', paper_vid,
+                               (paper_title, paper_abstract, paper_publish_time, int(paper_downloads), int(paper_pages), int(paper_citations)),
+                               if_not_exists=not overwrite)
 
-# 分割专辑
-def split_albums(album_str):
-    if pd.isna(album_str) or album_str == "无":
-        return []
-    return [album.strip() for album in re.split('[；;，,、]', album_str) if album.strip()]
+            # 处理期刊顶点
+            if journal_name and journal_name not in inserted_vertices['journal']:
+                journal_vid = generate_vid('journal', journal_name)
+                batcher.add_vertex('journal', 'name', journal_vid, (journal_name,))
+                inserted_vertices['journal'].add(journal_name)
 
-# 添加字符串清理函数
-def clean_text_for_nebula(text):
-    try:
-        # 尝试解码和重新编码以删除无效字符
-        text = text.encode('utf-8', 'ignore').decode('utf-8')
-        
-        # 规范化 Unicode
-        text = unicodedata.normalize('NFKC', text)
-        
-        # 替换引号，防止 SQL 注入和语法错误
-        text = text.replace("'", "\\'").replace('"', '\\"')
-        
-        # 删除可能导致问题的不可见字符
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
-        
-        return text
-    except Exception as e:
-        print(f"清理文本时出错: {e}")
-        # 如果处理失败，返回安全的空字符串
-        return ""
+            # 添加论文与期刊的关系
+            if journal_name:
+                journal_vid = generate_vid('journal', journal_name)
+                batcher.add_edge('which_journal', paper_vid, journal_vid)
+            # 处理基金资助（名称和项目号已在清理阶段处理）
+            if funds:
+                for fund_name, fund_number in funds:
+                    if fund_name and fund_name not in inserted_vertices['fund']:
+                        fund_vid = generate_vid('fund', fund_name)
+                        batcher.add_vertex('fund', 'name, fund_number', fund_vid, (fund_name, fund_number))
+                        inserted_vertices['fund'].add(fund_name)
 
-config = Config() # 定义一个配置
-config.max_connection_pool_size = 10 # 设置最大连接数
-connection_pool = ConnectionPool() # 初始化连接池
-# 如果给定的服务器是ok的，返回true，否则返回false
-ok = connection_pool.init([('127.0.0.1', 9669)], config)
+                    if fund_name:
+                        fund_vid = generate_vid('fund', fund_name)
+                        batcher.add_edge('which_fund', paper_vid, fund_vid)
+            # 处理作者和单位（姓名和单位已在清理阶段处理）
+            if authors:
+                for author_name, author_affiliation in authors:
+                    if author_name and author_name not in inserted_vertices['author']:
+                        author_vid = generate_vid('author', author_name)
+                        batcher.add_vertex('author', 'name', author_vid, (author_name,))
+                        inserted_vertices['author'].add(author_name)
 
-with connection_pool.session_context('root', 'nebula') as session:
-    # 创建图空间test_paperdata
-    try:
-        # 检查图空间是否已存在
-        check_space_result = session.execute('SHOW SPACES')
-        existing_spaces = [record.values()[0].as_string() for record in check_space_result]
-        
-        if 'test_paperdata' not in existing_spaces:
-            print("创建新的图空间: test_paperdata")
-            # 创建图空间
-            create_space_stmt = '''
-            CREATE SPACE IF NOT EXISTS test_paperdata (
-                vid_type = FIXED_STRING(256),
-                partition_num = 10,
-                replica_factor = 1
-            )
-            '''
-            session.execute(create_space_stmt)
-            # 提交事务
-            session.execute('COMMIT')
-            # 提交统计信息
-            session.execute('SUBMIT JOB STATS')
-            print("等待图空间创建完成...")
-            import time
-            time.sleep(20)  # 等待图空间创建完成
-            
-            # 切换到新创建的图空间
-            session.execute('USE test_paperdata')
-            
-            # 创建索引和Tags/Edges
-            print("创建标签（Tags）和边类型（Edge Types）...")
-            
-            # 创建标签
-            session.execute('CREATE TAG IF NOT EXISTS paper(title string, abstract string, release_time string, download_times int, page int, quote_times int)')
-            session.execute('CREATE TAG IF NOT EXISTS journal(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS author(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS organization(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS key_word(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS classification_number(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS topic(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS album(name string)')
-            session.execute('CREATE TAG IF NOT EXISTS fund(name string, fund_number string)')
+                    if author_name:
+                        author_vid = generate_vid('author', author_name)
+                        batcher.add_edge('which_author', paper_vid, author_vid)
+                    # 处理单位
+                    for org_name in author_affiliation:
+                        if org_name and org_name not in inserted_vertices['organization']:
+                            org_vid = generate_vid('organization', org_name)
+                            batcher.add_vertex('organization', 'name', org_vid, (org_name,))
+                            inserted_vertices['organization'].add(org_name)
+
+                        if org_name:
+                            org_vid = generate_vid('organization', org_name)
+                            batcher.add_edge('which_organization', paper_vid, org_vid)
+                        # 任职关系需要作者和单位都有名称，作者为空时不能沿用上一位作者的VID
+                        if author_name and org_name:
+                            batcher.add_edge('taking_office', author_vid, org_vid)
+
+            # 处理关键词
+            keywords = keywords_by_row.get(row.Index, [])
+            for keyword in keywords:
+                if keyword and keyword not in inserted_vertices['key_word']:
+                    keyword_vid = generate_vid('key_word', keyword)
+                    batcher.add_vertex('key_word', 'name', keyword_vid, (keyword,))
+                    inserted_vertices['key_word'].add(keyword)
+
+                if keyword:
+                    keyword_vid = generate_vid('key_word', keyword)
+                    batcher.add_edge('which_key_word', paper_vid, keyword_vid)
+
+            # 处理分类号
+            classifications = classifications_by_row.get(row.Index, [])
+            for cls in classifications:
+                if cls and cls not in inserted_vertices['classification']:
+                    cls_vid = generate_vid('classification', cls)
+                    batcher.add_vertex('classification_number', 'name', cls_vid, (cls,))
+                    inserted_vertices['classification'].add(cls)
+
+                if cls:
+                    cls_vid = generate_vid('classification', cls)
+                    batcher.add_edge('which_classification_number', paper_vid, cls_vid)
+
+            # 处理专题
+            topics = topics_by_row.get(row.Index, [])
+            for topic in topics:
+                if topic and topic not in inserted_vertices['topic']:
+                    topic_vid = generate_vid('topic', topic)
+                    batcher.add_vertex('topic', 'name', topic_vid, (topic,))
+                    inserted_vertices['topic'].add(topic)
 
-            # 创建边类型
-            session.execute('CREATE EDGE IF NOT EXISTS which_journal()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_author()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_organization()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_key_word()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_classification_number()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_topic()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_album()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_fund()')
-            session.execute('CREATE EDGE IF NOT EXISTS which_reference()')
-            session.execute('CREATE EDGE IF NOT EXISTS taking_office()')
+                if topic:
+                    topic_vid = generate_vid('topic', topic)
+                    batcher.add_edge('which_topic', paper_vid, topic_vid)
 
-            
-            # 创建索引
-            print("创建索引...")
-            session.execute('CREATE TAG INDEX IF NOT EXISTS i_paper ON paper()')
-            print("等待索引构建完成...")
-            time.sleep(20)  # 等待索引构建完成
-            
-            print("图空间 test_paperdata 创建成功！")
-            result = session.execute('SHOW TAGS')
-            print(result)
-        else:
-            print("图空间 test_paperdata 已存在，将直接使用。")
-            session.execute('USE test_paperdata')
-    except Exception as e:
-        print(f"创建图空间时出错: {str(e)}")
+            # 处理专辑
+            albums = albums_by_row.get(row.Index, [])
+            for album in albums:
+                if album and album not in inserted_vertices['album']:
+                    album_vid = generate_vid('album', album)
+                    batcher.add_vertex('album', 'name', album_vid, (album,))
+                    inserted_vertices['album'].add(album)
 
-    # 追踪已插入的顶点，避免重复
-    inserted_vertices = {
-        'journal': set(),
-        'author': set(),
-        'organization': set(),
-        'key_word': set(),
-        'classification': set(),
-        'topic': set(),
-        'album': set(),
-        'fund': set(),
-        'paper': set()
-    }
-    
-    # 创建顶点ID映射和计数器
-    vid_mapping = {}  # 存储实体名称到VID的映射
-    counter = {
-        'paper': 1,
-        'journal': 1,
-        'author': 1,
-        'organization': 1,
-        'key_word': 1,
-        'classification': 1,
-        'topic': 1,
-        'album': 1,
-        'fund': 1
-    }
-    
-    # 生成VID的函数
-    def generate_vid(entity_type, entity_name):
-        if entity_name in vid_mapping:
-            return vid_mapping[entity_name]
-        
-        # 为该实体创建新的VID
-        new_vid = f"{entity_type}{counter[entity_type]:02d}"
-        vid_mapping[entity_name] = new_vid
-        counter[entity_type] += 1
-        return new_vid
-    
-    # 批量插入的语句列表
-    nGQL_statements = []
-    
-    # 遍历每一行数据
-    for (index,row),paper_row in zip(data_df.iterrows(),papers):
-        paper_title = preprocess_string(row['论文标题'])
-        paper_abstract = clean_text_for_nebula(preprocess_string(row['摘要']))
-        paper_publish_time = preprocess_string(row['发表时间'])
-        paper_downloads = preprocess_string(row['下载量'])
-        paper_pages = extract_page_number(row['页数'])
-        paper_citations = row['引用量']
-        
-        journal_name = preprocess_string(row['期刊名称'])
-        
-        # 生成论文顶点ID
-        paper_vid = generate_vid('paper', paper_title)
-        
-        # 处理论文顶点
-        nGQL_statements.append(f'''
-        INSERT VERTEX IF NOT EXISTS paper(title, abstract, release_time, download_times, page, quote_times) 
-        VALUES "{paper_vid}":('{paper_title}', '{paper_abstract}', '{paper_publish_time}', {int(paper_downloads)}, {int(paper_pages)}, {int(paper_citations)})
-        ''')
-        
-        # 处理期刊顶点
-        if journal_name and journal_name not in inserted_vertices['journal']:
-            journal_vid = generate_vid('journal', journal_name)
-            nGQL_statements.append(f'''
-            INSERT VERTEX IF NOT EXISTS journal(name) VALUES "{journal_vid}":('{journal_name}')
-            ''')
-            inserted_vertices['journal'].add(journal_name)
-        
-        # 添加论文与期刊的关系
-        if journal_name:
-            journal_vid = vid_mapping[journal_name]
-            nGQL_statements.append(f'''
-            INSERT EDGE IF NOT EXISTS which_journal() VALUES "{paper_vid}"->"{journal_vid}":()
-            ''')
-        paper_info = read_paper_info(paper_row)
-        # 处理基金资助
-        if '基金资助' in paper_info and paper_info['基金资助']:
-            for fund in paper_info['基金资助']:
-                fund_name = preprocess_string(fund.get('项目名称', ''))
-                fund_number = preprocess_string(fund.get('项目号', ''))
-                
-                if fund_name and fund_name not in inserted_vertices['fund']:
-                    fund_vid = generate_vid('fund', fund_name)
-                    nGQL_statements.append(f'''
-                    INSERT VERTEX IF NOT EXISTS fund(name, fund_number) VALUES "{fund_vid}":('{fund_name}', '{fund_number}')
-                    ''')
-                    inserted_vertices['fund'].add(fund_name)
-                
-                if fund_name:
-                    fund_vid = vid_mapping[fund_name]
-                    nGQL_statements.append(f'''
-                    INSERT EDGE IF NOT EXISTS which_fund() VALUES "{paper_vid}"->"{fund_vid}":()
-                    ''')
-        # 处理作者和单位
-        if '作者' in paper_info and paper_info['作者']:
-            authors = paper_info['作者']
-            for author in authors:
-                author_name = preprocess_string(author.get('姓名', ''))
-                author_affiliation = author.get('单位', [])
-                
-                if author_name and author_name not in inserted_vertices['author']:
-                    author_vid = generate_vid('author', author_name)
-                    nGQL_statements.append(f'''
-                    INSERT VERTEX IF NOT EXISTS author(name) VALUES "{author_vid}":('{author_name}')
-                    ''')
-                    inserted_vertices['author'].add(author_name)
-                
-                if author_name:
-                    author_vid = vid_mapping[author_name]
-                    nGQL_statements.append(f'''
-                    INSERT EDGE IF NOT EXISTS which_author() VALUES "{paper_vid}"->"{author_vid}":()
-                    ''')
-                # 处理单位
-                for org_name in author_affiliation:
-                    org_name = preprocess_string(org_name)
-                    if org_name and org_name not in inserted_vertices['organization']:
-                        org_vid = generate_vid('organization', org_name)
-                        nGQL_statements.append(f'''
-                        INSERT VERTEX IF NOT EXISTS organization(name) VALUES "{org_vid}":('{org_name}')
-                        ''')
-                        inserted_vertices['organization'].add(org_name)
-                    
-                    if org_name:
-                        org_vid = vid_mapping[org_name]
-                        nGQL_statements.append(f'''
-                        INSERT EDGE IF NOT EXISTS which_organization() VALUES "{paper_vid}"->"{org_vid}":()
-                        ''')
-                        nGQL_statements.append(f'''
-                        INSERT EDGE IF NOT EXISTS taking_office() VALUES "{author_vid}"->"{org_vid}":()
-                        ''')
-        
-        # 处理关键词
-        keywords = split_keywords(row['关键词'])
-        for keyword in keywords:
-            if keyword and keyword not in inserted_vertices['key_word']:
-                keyword_vid = generate_vid('key_word', keyword)
-                nGQL_statements.append(f'''
-                INSERT VERTEX IF NOT EXISTS key_word(name) VALUES "{keyword_vid}":('{keyword}')
-                ''')
-                inserted_vertices['key_word'].add(keyword)
-            
-            if keyword:
-                keyword_vid = vid_mapping[keyword]
-                nGQL_statements.append(f'''
-                INSERT EDGE IF NOT EXISTS which_key_word() VALUES "{paper_vid}"->"{keyword_vid}":()
-                ''')
-        
-        # 处理分类号
-        classifications = split_classification(row['分类号'])
-        for cls in classifications:
-            if cls and cls not in inserted_vertices['classification']:
-                cls_vid = generate_vid('classification', cls)
-                nGQL_statements.append(f'''
-                INSERT VERTEX IF NOT EXISTS classification_number(name) VALUES "{cls_vid}":('{cls}')
-                ''')
-                inserted_vertices['classification'].add(cls)
-            
-            if cls:
-                cls_vid = vid_mapping[cls]
-                nGQL_statements.append(f'''
-                INSERT EDGE IF NOT EXISTS which_classification_number() VALUES "{paper_vid}"->"{cls_vid}":()
-                ''')
-        
-        # 处理专题
-        topics = split_topics(row['专题'])
-        for topic in topics:
-            if topic and topic not in inserted_vertices['topic']:
-                topic_vid = generate_vid('topic', topic)
-                nGQL_statements.append(f'''
-                INSERT VERTEX IF NOT EXISTS topic(name) VALUES "{topic_vid}":('{topic}')
-                ''')
-                inserted_vertices['topic'].add(topic)
-            
-            if topic:
-                topic_vid = vid_mapping[topic]
-                nGQL_statements.append(f'''
-                INSERT EDGE IF NOT EXISTS which_topic() VALUES "{paper_vid}"->"{topic_vid}":()
-                ''')
-        
-        # 处理专辑
-        albums = split_albums(row['专辑'])
-        for album in albums:
-            if album and album not in inserted_vertices['album']:
-                album_vid = generate_vid('album', album)
-                nGQL_statements.append(f'''
-                INSERT VERTEX IF NOT EXISTS album(name) VALUES "{album_vid}":('{album}')
-                ''')
-                inserted_vertices['album'].add(album)
-            
-            if album:
-                album_vid = vid_mapping[album]
-                nGQL_statements.append(f'''
-                INSERT EDGE IF NOT EXISTS which_album() VALUES "{paper_vid}"->"{album_vid}":()
-                ''')
-    
-    # 执行所有语句
-    print(f"共计 {len(nGQL_statements)} 条语句等待执行")
-    
-    # 批量执行插入语句，每500条执行一次
-    batch_size = 500
-    for i in range(0, len(nGQL_statements), batch_size):
-        batch = nGQL_statements[i:i+batch_size]
-        for stmt in batch:
-            try:
-                result = session.execute(stmt)
-                if not result.is_succeeded():
-                    print(f"执行失败: {stmt}")
-                    print(f"错误信息: {result.error_msg()}")
-            except Exception as e:
-                print(f"执行异常: {stmt}")
-                print(f"异常信息: {str(e)}")
-        print(f"已执行 {min(i+batch_size, len(nGQL_statements))} / {len(nGQL_statements)} 条语句")
-    
-    print("元数据导入完成")
-    # 提交事务
-    session.execute('COMMIT')
-    # 提交统计信息
-    session.execute('SUBMIT JOB STATS')
-    nGQL_statements = []  # 清空语句列表，准备下一步操作
-    # 导入每篇论文的参考文献
-    for (index,row),paper_row in zip(data_df.iterrows(),papers):
-        paper_title = preprocess_string(row['论文标题'])
-        paper_info = read_paper_info(paper_row)
-        #处理参考文献
-        if '参考文献' in paper_info and paper_info['参考文献']:
-            references = paper_info['参考文献']
+                if album:
+                    album_vid = generate_vid('album', album)
+                    batcher.add_edge('which_album', paper_vid, album_vid)
+            paper_checkpoint.mark(paper_title, fingerprint)
+            if len(paper_checkpoint.pending) >= checkpoint_every:
+                # 分段结束：交出本段全部批次，执行完成后保存本段论文的指纹
+                vid_registry.commit()
+                yield from batcher.batches()
+                yield Barrier(paper_checkpoint.commit_segment)
+                continue
+            ready = batcher.take_ready()
+            if ready:
+                # 语句发出之前先持久化新分配的VID
+                vid_registry.commit()
+                yield from ready
+        vid_registry.commit()
+        yield from batcher.batches()
+        yield Barrier(paper_checkpoint.commit_segment)
+        print(f"增量导入跳过了 {paper_checkpoint.skipped} 篇未变化的论文")
+
+    def import_metadata(self):
+        ctx = self.ctx
+        self.assign_vids()
+        # 元数据和参考文献两个阶段分别记录指纹，中途失败后重新运行会从最后一个成功的分段继续
+        paper_checkpoint = ImportCheckpoint(self.checkpoint_path, 'paper')
+        print(f"检查点: 元数据已完成 {paper_checkpoint.rows} 篇")
+        # 按标签/边类型合并的批量插入语句，重复的边（如同一作者在多篇论文中的 taking_office）在这里丢弃
+        batcher = ctx.batcher()
+        self.progress['papers'] = 0
+        self.references = []
+        ctx.execute('metadata_import', self._paper_batches(paper_checkpoint, batcher),
+                    source_progress=lambda: self.progress['papers'] / len(self.data_df))
+        paper_checkpoint.close()
+        print(f"元数据导入完成，共丢弃 {batcher.duplicate_edges} 条重复的边")
+
+    def build_title_index(self):
+        # 论文标题到VID的本地索引：先用元数据阶段生成的映射填充，再一次性扫描图中已有的论文顶点
+        ctx = self.ctx
+        with ctx.metrics.timer('title_index'), ctx.session() as session:
+            title_index = TitleIndex(ctx.use_parameters)
+            title_index.update(ctx.vid_registry.items('paper'))
+            # 哈希VID不登记名称，本次导入的论文直接计算
+            title_index.update((title, ctx.vid_registry.get_or_assign('paper', title)) for title in self.paper_df['title'])
+            if session is not None:
+                print(f"已从图中加载 {title_index.load_from_graph(session)} 个论文标题")
+            # 持久化标题索引，单独运行的实体导入脚本可以直接使用
+            title_index.save(ctx.path('title_index.json'))
+        self.title_index = title_index
+        return title_index
+
+    # 参考文献阶段的批次：使用元数据阶段保存的参考文献标题，只需查本地索引
+    def _reference_batches(self, session, reference_checkpoint, batcher):
+        title_index, checkpoint_every = self.title_index, self.checkpoint_every
+        for paper_title, fingerprint, references in self.references:
+            self.progress['papers'] += 1
+            unchanged = self.incremental and reference_checkpoint.is_unchanged(paper_title, fingerprint)
+            if unchanged:
+                # 未变化的论文只重试上次没有找到的参考文献，例如本次新导入的论文
+                references = reference_checkpoint.unresolved.get(paper_title)
+                if not references:
+                    continue
             not_found_papers = []
-            for ref in references:
-                ref_title = preprocess_string(ref.get('题目', ''))
-                # 检查论文是否存在于图数据库中
-                check_result1 = session.execute(f'LOOKUP ON paper WHERE paper.title == "{ref_title}" YIELD id(VERTEX)')
-                # 检查论文是否存在于图数据库中
-                check_result2 = session.execute(f'LOOKUP ON paper WHERE paper.title == "{paper_title}" YIELD id(VERTEX)')
-                if check_result1.is_succeeded() and check_result1.rows() and check_result2.is_succeeded() and check_result2.rows():
-                    # 从查询结果中正确提取论文VID
-                    ref_vid = check_result1.column_values('id(VERTEX)')[0]  # 使用column_values获取VID
-                    paper_vid = check_result2.column_values('id(VERTEX)')[0]
-                    # 论文存在，添加关联关系
-                    nGQL_statements.append(f'''
-                    INSERT EDGE IF NOT EXISTS which_reference() VALUES {paper_vid}->{ref_vid}:()
-                    ''')
-                else:
-                    # 论文不存在，记录下来
-                    not_found_papers.append(ref_title)
-                    # 如果有未找到的论文，打印出来并保存到文件
-            if not_found_papers:
-                #print(f"论文 '{paper_title}' 参考的以下论文未找到: {not_found_papers}")
-                
-                # 将未找到的论文信息保存到文件
-                with open('/root/VscodeProject/PythonProject/nebula_data/not_found_papers.txt', 'a', encoding='utf-8') as f:
-                    f.write(f"论文: {paper_title}\n")
-                    for paper in not_found_papers:
-                        f.write(f"  - {paper}\n")
-                    f.write("\n")
-            # 执行所有语句
-    print(f"共计 {len(nGQL_statements)} 条语句等待执行")
-    # 批量执行插入语句，每500条执行一次
-    batch_size = 500
-    for i in range(0, len(nGQL_statements), batch_size):
-        batch = nGQL_statements[i:i+batch_size]
-        for stmt in batch:
-            try:
-                result = session.execute(stmt)
-                if not result.is_succeeded():
-                    print(f"执行失败: {stmt}")
-                    print(f"错误信息: {result.error_msg()}")
-            except Exception as e:
-                print(f"执行异常: {stmt}")
-                print(f"异常信息: {str(e)}")
-        print(f"已执行 {min(i+batch_size, len(nGQL_statements))} / {len(nGQL_statements)} 条语句")
-    print("参考文献数据导入完成")
-    # 提交事务
-    session.execute('COMMIT')
-    # 提交统计信息
-    session.execute('SUBMIT JOB STATS')
-    # 关闭连接池
-    connection_pool.close()
\ No newline at end of file
+            #处理参考文献
+            if references:
+                # 当前论文的VID只需解析一次
+                paper_vid = title_index.resolve(session, paper_title)
+                for ref_title in references:
+                    # 检查论文是否存在：优先查本地索引，未知标题才查询图数据库
+                    ref_vid = title_index.resolve(session, ref_title)
+                    if ref_vid and paper_vid:
+                        # 论文存在，添加关联关系
+                        batcher.add_edge('which_reference', paper_vid, ref_vid)
+                    else:
+                        # 论文不存在，记录下来；未找到的标题由索引统一统计
+                        not_found_papers.append(ref_title)
+            # 未找到的参考文献随指纹一起保存，下次运行时只重试这些标题；未变化的论文没有新找到的标题时不需要更新
+            if not unchanged or len(not_found_papers) < len(references):
+                reference_checkpoint.mark(paper_title, fingerprint, not_found_papers)
+            if len(reference_checkpoint.pending) >= checkpoint_every:
+                yield from batcher.batches()
+                yield Barrier(reference_checkpoint.commit_segment)
+                continue
+            yield from batcher.take_ready()
+        yield from batcher.batches()
+        yield Barrier(reference_checkpoint.commit_segment)
+
+    def import_references(self):
+        # 导入每篇论文的参考文献：同样逐篇生成批次并交给执行器
+        ctx = self.ctx
+        reference_checkpoint = ImportCheckpoint(self.checkpoint_path, 'reference')
+        print(f"检查点: 参考文献已完成 {reference_checkpoint.rows} 篇")
+        batcher = ctx.batcher()
+        self.progress['papers'] = 0
+        with ctx.session() as session:
+            # 先批量解析待处理论文引用的全部不同标题（未变化的论文只有上次未找到的标题），
+            # 逐篇生成边时只查本地索引，不再逐个标题查询图数据库
+            titles = set()
+            for paper_title, fingerprint, references in self.references:
+                if self.incremental and reference_checkpoint.fingerprints.get(paper_title) == fingerprint:
+                    references = reference_checkpoint.unresolved.get(paper_title, ())
+                if references:
+                    titles.update((paper_title, *references))
+            self.title_index.resolve_many(session, titles)
+            ctx.execute('reference_import', self._reference_batches(session, reference_checkpoint, batcher),
+                        source_progress=lambda: self.progress['papers'] / len(self.data_df))
+            print(f"参考文献解析完成，共向图数据库发起 {self.title_index.lookups} 次标题查询")
+            # 标题解析统计和未找到的参考文献（附近似候选）
+            self.title_index.write_report(ctx.path('title_resolution_references.json'))
+            reference_checkpoint.close()
+            self.references = None
+            print(f"参考文献数据导入完成，共丢弃 {batcher.duplicate_edges} 条重复的边")
+
+
+# 单独运行论文导入：各阶段依次执行。与实体导入一起运行时使用 pipeline.py
+def import_papers(connection_pool, data_dir=settings.data_dir, executor_workers=settings.executor_workers,
+                  incremental=settings.incremental, checkpoint_every=settings.checkpoint_every,
+                  metrics_interval=settings.metrics_interval, backend=settings.backend, export_dir=settings.export_dir,
+                  clean_workers=settings.clean_workers, clean_chunk_size=settings.clean_chunk_size,
+                  vid_scheme=settings.vid_scheme, space=settings.space, user=settings.user, password=settings.password,
+                  verify=settings.verify):
+    ctx = LoadContext(connection_pool, data_dir, space, user, password, PAPER_TAGS, PAPER_EDGES, PAPER_TAG_INDEXES,
+                      backend=backend, export_dir=export_dir, executor_workers=executor_workers,
+                      vid_scheme=vid_scheme, metrics_name='import_papers', metrics_interval=metrics_interval,
+                      config_name='import_papers_importer.yaml', verify_timeout=settings.verify_timeout,
+                      batch_max_rows=settings.batch_max_rows, batch_max_bytes=settings.batch_max_bytes,
+                      use_parameters=settings.use_parameters)
+    papers = PaperImport(ctx, incremental, checkpoint_every, clean_workers, clean_chunk_size)
+    try:
+        ctx.apply_schema()
+        papers.load_inputs()
+        papers.import_metadata()
+        papers.build_title_index()
+        papers.import_references()
+        # 一个统计作业确认图中的数量与本地生成的行数一致
+        report = ctx.verify() if verify else None
+    finally:
+        ctx.close()
+    check(report)
+
+
+if __name__ == '__main__':
+    if settings.backend == 'csv':
+        # 导出模式不需要连接图数据库
+        import_papers(None)
+    else:
+        config = Config() # 定义一个配置
+        config.max_connection_pool_size = settings.max_connection_pool_size # 设置每个 graphd 的最大连接数
+        # 每个 graphd 一个连接池，语句按各主机的延迟和在途请求数分配，失败的主机自动摘除
+        connection_pool = BalancedConnectionPool(settings.graphd_hosts, config)
+        import_papers(connection_pool)
+        connection_pool.print_summary()
+        # 关闭连接池
+        connection_pool.close()
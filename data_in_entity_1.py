@@ -1,121 +1,155 @@
-from nebula3.gclient.net import ConnectionPool
 from nebula3.Config import Config
-import numpy as np
-import pandas as pd
-import re
-import time
+import settings
+from title_index import TitleIndex
+from preprocess import preprocess_entities, group_by_row
+from loaders import read_excel_cached
+from schema import ENTITY_TAGS, ENTITY_EDGES
+from load_context import LoadContext
+from verify import check
+from dedup import VertexIdSet
+from host_pool import BalancedConnectionPool
 
-# 预处理函数：处理字符串以便可以安全地在nGQL查询中使用
-def preprocess_string(s):
-    if pd.isna(s) or s == "无":
-        return ""
-    # 转为字符串并去除引号，防止SQL注入
-    return str(s).replace("'", "''").strip()
-# 生成VID的函数
-def generate_vid(entity_type, entity_name):
-    if entity_name in vid_mapping:
-        return vid_mapping[entity_name]
-    # 为该实体创建新的VID
-    new_vid = f"{entity_type}{counter[entity_type]:02d}"
-    vid_mapping[entity_name] = new_vid
-    counter[entity_type] += 1
-    return new_vid
 
-config = Config() # 定义一个配置
-config.max_connection_pool_size = 10 # 设置最大连接数
-connection_pool = ConnectionPool() # 初始化连接池
-# 如果给定的服务器是ok的，返回true，否则返回false
-ok = connection_pool.init([('127.0.0.1', 9669)], config)
-data_df = pd.read_excel("/root/VscodeProject/PythonProject/nebula_data/实体.xlsx", 
-                      usecols=['实体', '分数', '关联论文'])
+class EntityImport:
+    # 关键技术实体导入的各个阶段：load_inputs → import_vertices → import_edges。
+    # 实体顶点不依赖论文，可以和参考文献阶段同时执行；关联论文的边需要论文的标题索引
+    def __init__(self, ctx):
+        self.ctx = ctx
+        # 追踪已插入的顶点，避免重复；按登记表中的编号记录，不再保存名称
+        self.inserted_vertices = {
+            'entity': VertexIdSet(ctx.vid_registry, 'sensitive_entity'),
+        }
+        # 已解析的实体行数，用于估算总语句数
+        self.progress = {'entities': 0}
 
+    def load_inputs(self):
+        metrics = self.ctx.metrics
+        # Excel 只在文件变化时重新解析，其余时候读取缓存的快照
+        with metrics.timer('read_excel'):
+            self.data_df = read_excel_cached(self.ctx.path(settings.entity_excel),
+                                             usecols=['实体', '分数', '关联论文'])
+        # 按列预处理实体表，关联论文拆成 (行, 标题) 长表
+        with metrics.timer('preprocess'):
+            self.entity_df, self.related_papers_df = preprocess_entities(self.data_df)
+            self.related_papers_by_row = group_by_row(self.related_papers_df)
 
-with connection_pool.session_context('root', 'nebula') as session:
-    # 使用test_paperdata空间
-    session.execute('USE test_paperdata')
-    session.execute('CREATE TAG IF NOT EXISTS sensitive_entity(entity_name string, sensitive int)')
-    session.execute('CREATE EDGE IF NOT EXISTS related_to_paper()')
-    #time.sleep(10)  # 等待索引构建完成
-    # 追踪已插入的顶点，避免重复
-    inserted_vertices = {
-        'entity': set(),
-    }
-        # 创建顶点ID映射和计数器
-    vid_mapping = {}  # 存储实体名称到VID的映射
-    counter = {
-        'sensitive_entity': 1
-    }
-    # 批量插入的语句列表
-    nGQL_statements = []
-    
-    # 遍历每一行数据
-    for index, row in data_df.iterrows():
-        entity_name = preprocess_string(row['实体'])
-        sensitive = int(row['分数']) if not pd.isna(row['分数']) else 0
-        related_papers_str = preprocess_string(row['关联论文'])
-        
-        # 处理关键技术实体顶点
-        if entity_name and entity_name not in inserted_vertices['entity']:
-            entity_vid = generate_vid('sensitive_entity', entity_name)
-# 修正语法：注意引号的正确使用方式
-            nGQL_statements.append(f'''
-            INSERT VERTEX IF NOT EXISTS sensitive_entity(entity_name, sensitive) 
-            VALUES "{entity_vid}":("{entity_name}", {sensitive})
-            ''')
-            inserted_vertices['entity'].add(entity_name)
-        
-        # 处理关联论文 - 分割可能包含多个论文的字符串
-        if related_papers_str:
-            # 清理格式：移除多余的引号、方括号和其他干扰字符
-            clean_papers_str = related_papers_str.replace('[', '').replace(']', '').replace('"', '').replace("'", "")
-            
-            # 使用方括号内的任意标点符号分割论文标题
-            related_papers = [paper.strip() for paper in re.split('[,]', clean_papers_str) if paper.strip()]
-            
-            not_found_papers = []
-            for paper_title in related_papers:
-                
-                # 检查论文是否存在于图数据库中
-                check_result = session.execute(f'LOOKUP ON paper WHERE paper.title == "{paper_title}" YIELD id(VERTEX)')
+    def _run(self, phase, batches):
+        self.progress['entities'] = 0
+        self.ctx.execute(phase, batches, source_progress=lambda: self.progress['entities'] / len(self.data_df))
 
-                if check_result.is_succeeded() and check_result.rows():
-                    # 从查询结果中正确提取论文VID
-                    paper_vid = check_result.column_values('id(VERTEX)')[0]  # 使用column_values获取VID
-                    # 论文存在，添加关联关系
-                    nGQL_statements.append(f'''
-                    INSERT EDGE IF NOT EXISTS related_to_paper() VALUES "{entity_vid}"->{paper_vid}:()
-                    ''')
-                else:
-                    # 论文不存在，记录下来
-                    not_found_papers.append(paper_title)
-            
-            # 如果有未找到的论文，打印出来并保存到文件
-            if not_found_papers:
-                print(f"实体 '{entity_name}' 关联的以下论文未找到: {not_found_papers}")
-                
-                # 将未找到的论文信息保存到文件
-                with open('/root/VscodeProject/PythonProject/nebula_data/not_found_papers.txt', 'a', encoding='utf-8') as f:
-                    f.write(f"实体: {entity_name}\n")
-                    for paper in not_found_papers:
-                        f.write(f"  - {paper}\n")
-                    f.write("\n")
-    
-    # 执行所有语句
-    print(f"共计 {len(nGQL_statements)} 条语句等待执行")
-    
-    # 批量执行插入语句，每500条执行一次
-    batch_size = 500
-    for i in range(0, len(nGQL_statements), batch_size):
-        batch = nGQL_statements[i:i+batch_size]
-        for stmt in batch:
-            try:
-                result = session.execute(stmt)
-                if not result.is_succeeded():
-                    print(f"执行失败: {stmt}")
-                    print(f"错误信息: {result.error_msg()}")
-            except Exception as e:
-                print(f"执行异常: {stmt}")
-                print(f"异常信息: {str(e)}")
-        print(f"已执行 {min(i+batch_size, len(nGQL_statements))} / {len(nGQL_statements)} 条语句")
-    
-    print("关键技术数据导入完成")
\ No newline at end of file
+    # 实体顶点的批次：逐行交出已经装满的批次，边生成边执行
+    def _vertex_batches(self, batcher):
+        vid_registry = self.ctx.vid_registry
+        inserted_vertices = self.inserted_vertices
+        for row in self.entity_df.itertuples():
+            self.progress['entities'] += 1
+            entity_name = row.entity_name
+            # 处理关键技术实体顶点
+            if entity_name and entity_name not in inserted_vertices['entity']:
+                entity_vid = vid_registry.get_or_assign('sensitive_entity', entity_name)
+                # 属性值作为参数传递，不需要处理引号
+                batcher.add_vertex('sensitive_entity', 'entity_name, sensitive', entity_vid, (entity_name, int(row.sensitive)))
+                inserted_vertices['entity'].add(entity_name)
+            ready = batcher.take_ready()
+            if ready:
+                # 语句发出之前先持久化新分配的VID
+                vid_registry.commit()
+                yield from ready
+        vid_registry.commit()
+        yield from batcher.batches()
+
+    def import_vertices(self):
+        # 实体顶点的VID只在这里分配，之后生成边时直接使用
+        self._run('entity_import', self._vertex_batches(self.ctx.batcher()))
+        print("关键技术实体顶点导入完成")
+
+    def resolve_papers(self, session, title_index=None):
+        # 收集整个表格中去重后的关联论文标题，在生成边之前统一解析为VID。
+        # 和论文导入一起运行时直接使用论文阶段建好的标题索引，否则按登记表、持久化的索引、图中扫描的顺序建立
+        with self.ctx.metrics.timer('paper_resolution'):
+            distinct_titles = self.related_papers_df['name'].drop_duplicates().tolist()
+            if title_index is None:
+                title_index = TitleIndex(self.ctx.use_parameters)
+                # 论文导入脚本登记过的论文直接从VID登记表得到，无需查询服务端
+                title_index.update(self.ctx.vid_registry.items('paper'))
+                # 登记表为空时使用持久化的标题索引，仍然没有时一次扫描图中全部论文顶点
+                if not title_index and not title_index.load(self.ctx.path('title_index.json')) and session is not None:
+                    title_index.load_from_graph(session)
+            else:
+                # 共用的索引中保留着参考文献阶段的解析统计，本阶段的报告只统计关联论文
+                title_index.reset_stats()
+            # 索引中仍然缺失的标题按块批量查询
+            title_index.resolve_many(session, distinct_titles)
+        print(f"关联论文共 {len(distinct_titles)} 个不同标题，已解析 {sum(t in title_index for t in distinct_titles)} 个，"
+              f"向图数据库发起 {title_index.lookups} 次标题查询")
+        return title_index
+
+    # 关联论文的批次：生成边只需查本地缓存
+    def _edge_batches(self, session, title_index, batcher):
+        generate_vid = self.ctx.vid_registry.get_or_assign
+        related_papers_by_row = self.related_papers_by_row
+        for row in self.entity_df.itertuples():
+            self.progress['entities'] += 1
+            entity_name = row.entity_name
+            related_papers = related_papers_by_row.get(row.Index, [])
+            # 处理关联论文
+            if entity_name and related_papers:
+                entity_vid = generate_vid('sensitive_entity', entity_name)
+                for paper_title in related_papers:
+                    # 原标题或规范化标题匹配；未找到的标题由索引统一统计
+                    paper_vid = title_index.resolve(session, paper_title)
+                    if paper_vid:
+                        # 论文存在，添加关联关系
+                        batcher.add_edge('related_to_paper', entity_vid, paper_vid)
+            yield from batcher.take_ready()
+        yield from batcher.batches()
+
+    def import_edges(self, title_index=None):
+        batcher = self.ctx.batcher()
+        with self.ctx.session() as session:
+            title_index = self.resolve_papers(session, title_index)
+            self._run('related_paper_import', self._edge_batches(session, title_index, batcher))
+        # 标题解析统计和未找到的关联论文（附近似候选）
+        title_index.write_report(self.ctx.path('title_resolution_related_papers.json'))
+        print(f"共丢弃 {batcher.duplicate_edges} 条重复的边")
+        print("关键技术数据导入完成")
+
+
+# 单独运行实体导入：论文需要已经导入。与论文导入一起运行时使用 pipeline.py
+def import_entities(connection_pool, data_dir=settings.data_dir, executor_workers=settings.executor_workers,
+                    metrics_interval=settings.metrics_interval, backend=settings.backend,
+                    export_dir=settings.export_dir, vid_scheme=settings.vid_scheme, space=settings.space,
+                    user=settings.user, password=settings.password, verify=settings.verify):
+    # 导出模式不连接图数据库，关联论文只能通过论文导入脚本登记的VID解析
+    ctx = LoadContext(connection_pool, data_dir, space, user, password, ENTITY_TAGS, ENTITY_EDGES,
+                      backend=backend, export_dir=export_dir, executor_workers=executor_workers,
+                      vid_scheme=vid_scheme, metrics_name='import_entities', metrics_interval=metrics_interval,
+                      config_name='import_entities_importer.yaml', verify_timeout=settings.verify_timeout,
+                      batch_max_rows=settings.batch_max_rows, batch_max_bytes=settings.batch_max_bytes,
+                      use_parameters=settings.use_parameters)
+    entities = EntityImport(ctx)
+    try:
+        ctx.apply_schema()
+        entities.load_inputs()
+        entities.import_vertices()
+        entities.import_edges()
+        # 一个统计作业确认图中的数量与本地生成的行数一致
+        report = ctx.verify() if verify else None
+    finally:
+        ctx.close()
+    check(report)
+
+
+if __name__ == '__main__':
+    if settings.backend == 'csv':
+        # 导出模式不需要连接图数据库
+        import_entities(None)
+    else:
+        config = Config() # 定义一个配置
+        config.max_connection_pool_size = settings.max_connection_pool_size # 设置每个 graphd 的最大连接数
+        # 每个 graphd 一个连接池，语句按各主机的延迟和在途请求数分配，失败的主机自动摘除
+        connection_pool = BalancedConnectionPool(settings.graphd_hosts, config)
+        import_entities(connection_pool)
+        connection_pool.print_summary()
+        # 关闭连接池
+        connection_pool.close()
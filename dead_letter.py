@@ -0,0 +1,130 @@
+# 失败记录：无法写入的行以 JSON Lines 格式保存，之后可以用一条命令重放
+#   python dead_letter.py /path/to/dead_letters.jsonl
+import argparse
+import json
+import os
+import threading
+import time
+
+import settings
+from nebula_batch import VERTEX, StatementBatcher
+from nebula_executor import ParallelExecutor
+
+
+class DeadLetterFile:
+    # 每行一条记录，包含重建语句所需的标签/边类型、属性列表和行文本，以及错误信息。多个执行线程共用
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, batch, error, retryable, attempts):
+        now = time.time()
+        with self.lock:
+            if self.file is None:
+                # 第一次失败时才创建文件，追加到以前的记录之后
+                self.file = open(self.path, 'a', encoding='utf-8')
+            for row in batch.rows:
+                record = {
+                    'kind': batch.kind,
+                    'name': batch.name,
+                    'props': batch.props,
+                    'if_not_exists': batch.if_not_exists,
+                    # 行的字面量文本便于查看；VID 和属性值另外原样保存，重放时仍然作为参数执行
+                    'row': batch.row_text(row),
+                    'ids': row[0],
+                    'values': row[1],
+                    'error': error,
+                    'retryable': retryable,
+                    'attempts': attempts,
+                    'time': now,
+                }
+                self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.file.flush()
+            self.count += len(batch)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def report(self):
+        if self.count:
+            print(f"有 {self.count} 行无法写入，已记录到 {self.path}，"
+                  f"排除问题后可用 python dead_letter.py {self.path} 重放")
+
+
+def read_dead_letters(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# 重放失败记录：按原来的标签/边类型重新合并为批量语句执行（顶点先于边），仍然失败的行留在文件中
+def replay(connection_pool, path, space, workers=4, user='root', password='nebula',
+           use_parameters=settings.use_parameters):
+    batcher = StatementBatcher()
+    total = 0
+    seen = set()
+    for record in read_dead_letters(path):
+        key = (record['kind'], record['name'], record['props'], record['if_not_exists'], record['row'])
+        # 同一行可能在多次运行中被记录
+        if key in seen:
+            continue
+        seen.add(key)
+        if record['kind'] == VERTEX:
+            batcher.add_vertex(record['name'], record['props'], record['ids'][0], record['values'],
+                               record['if_not_exists'])
+        else:
+            batcher.add_edge(record['name'], *record['ids'], record['props'], record['values'], record['if_not_exists'])
+        total += 1
+    print(f"从 {path} 读取到 {total} 行待重放")
+    remaining_path = path + '.remaining'
+    if os.path.exists(remaining_path):
+        os.remove(remaining_path)
+    with DeadLetterFile(remaining_path) as remaining, \
+            ParallelExecutor(connection_pool, space, workers=workers, user=user, password=password,
+                             dead_letters=remaining, use_parameters=use_parameters) as executor:
+        ok, failed = executor.execute(batcher.batches())
+    if failed:
+        os.replace(remaining_path, path)
+        print(f"重放完成：成功 {ok} 行，仍有 {failed} 行失败，已保留在 {path}")
+    else:
+        os.remove(path)
+        print(f"重放完成：{ok} 行全部写入成功，已删除 {path}")
+    return ok, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重放导入过程中无法写入的行")
+    parser.add_argument('path', help="失败记录文件（dead_letters.jsonl）")
+    parser.add_argument('--address', default=','.join(f'{h}:{p}' for h, p in settings.graphd_hosts),
+                        help="graphd 地址，host:port，多个地址用逗号分隔")
+    parser.add_argument('--space', default=settings.space, help="图空间")
+    parser.add_argument('--user', default=settings.user)
+    parser.add_argument('--password', default=settings.password)
+    parser.add_argument('--workers', type=int, default=4, help="并行写入的会话数")
+    args = parser.parse_args()
+
+    from nebula3.Config import Config
+    from host_pool import BalancedConnectionPool, parse_hosts
+    config = Config()
+    config.max_connection_pool_size = args.workers + 1
+    connection_pool = BalancedConnectionPool(parse_hosts(args.address), config)
+    try:
+        replay(connection_pool, args.path, args.space, workers=args.workers, user=args.user, password=args.password)
+    finally:
+        connection_pool.close()
+
+
+if __name__ == '__main__':
+    main()
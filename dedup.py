@@ -0,0 +1,106 @@
+# 紧凑的去重结构：顶点按VID登记表中的稠密编号记在按位存储的 NumPy 数组中（每个编号一位），
+# 边按 64 位哈希键记在有序数组中（每个键 8 字节）；Python set 中每个整数约占 60 字节（哈希表槽位加整数对象）
+import hashlib
+
+import numpy as np
+
+
+def key64(*parts):
+    # 进程内的 64 位哈希键。字符串哈希每次运行都会随机化，只能用于内存中的去重；
+    # 一亿个键发生碰撞的概率约为万分之三，碰撞的后果只是少写一条重复判断错误的边
+    return hash(parts)
+
+
+def stable_key64(*parts):
+    # 与进程无关的 64 位键（有符号），可以保存到文件中跨运行使用；比 key64 慢，只用于需要持久化的记录
+    data = '\x1f'.join(map(str, parts)).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+
+class IdSet:
+    # 稠密整数编号的集合：按位记录，每个编号占一位（uint8 数组的一个字节记 8 个编号），容量按需翻倍
+    def __init__(self, capacity=1024):
+        self.bits = np.zeros((capacity + 7) >> 3, dtype=np.uint8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, n):
+        i = n >> 3
+        return i < len(self.bits) and bool(self.bits[i] & (1 << (n & 7)))
+
+    def add(self, n):
+        # 返回是否是新加入的编号
+        i, bit = n >> 3, 1 << (n & 7)
+        if i >= len(self.bits):
+            bits = np.zeros(max(i + 1, len(self.bits) * 2), dtype=np.uint8)
+            bits[:len(self.bits)] = self.bits
+            self.bits = bits
+        if self.bits[i] & bit:
+            return False
+        self.bits[i] |= bit
+        self.count += 1
+        return True
+
+
+class Int64Set:
+    # 64 位整数键的集合：主体是有序的 int64 数组（每个键 8 字节），新键先放入小缓冲区，
+    # 缓冲区达到主体的 1/32 时归并进数组，归并的均摊代价是常数
+    def __init__(self, min_buffer=1 << 16, keys=None):
+        # keys 为已有的键（例如从文件读入的数组），可以无序、有重复
+        self.keys = np.empty(0, dtype=np.int64) if keys is None else np.unique(np.asarray(keys, dtype=np.int64))
+        self.buffer = set()
+        self.min_buffer = min_buffer
+
+    def __len__(self):
+        return len(self.keys) + len(self.buffer)
+
+    def __contains__(self, key):
+        if key in self.buffer:
+            return True
+        i = np.searchsorted(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def add(self, key):
+        # 返回是否是新加入的键
+        if key in self:
+            return False
+        self.buffer.add(key)
+        if len(self.buffer) >= max(self.min_buffer, len(self.keys) // 32):
+            self._merge()
+        return True
+
+    def to_array(self):
+        # 全部键组成的有序数组
+        if self.buffer:
+            self._merge()
+        return self.keys
+
+    def _merge(self):
+        new = np.fromiter(self.buffer, dtype=np.int64, count=len(self.buffer))
+        new.sort()
+        # 两段有序数据拼接后用稳定排序（timsort）归并，时间与总长度成线性
+        self.keys = np.concatenate((self.keys, new))
+        self.keys.sort(kind='stable')
+        self.buffer = set()
+
+
+class VertexIdSet:
+    # 某一类型已插入的顶点，与原来的名称集合用法相同（in / add），内部只保存VID登记表分配的编号；
+    # 哈希VID的编号不连续，改用 64 位键的集合
+    def __init__(self, registry, entity_type):
+        self.registry = registry
+        self.entity_type = entity_type
+        self.ids = IdSet() if registry.dense else Int64Set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        # 本次运行插入过的名称一定已经在登记表的内存缓存中，不需要查询 SQLite
+        n = self.registry.cached_id(self.entity_type, name)
+        return n is not None and n in self.ids
+
+    def add(self, name):
+        return self.ids.add(self.registry.get_or_assign_id(self.entity_type, name))
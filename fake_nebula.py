@@ -0,0 +1,327 @@
+# 离线替身：模拟 nebula3 的 ConnectionPool / Session，用于基准测试和无服务端的本地运行
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import statement_kind
+from nebula_batch import substitute, unescape
+
+# VID 是字符串或整数（INT64 图空间）字面量
+_ID = r'("(?:[^"\\]|\\.)*"|-?\d+)'
+_VERTEX_ROW = re.compile(_ID + r':\(')
+_PAPER_ROW = re.compile(_ID + r':\("((?:[^"\\]|\\.)*)"')
+_EDGE_ROW = re.compile(_ID + '->' + _ID)
+_QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def _id(token):
+    return unescape(token[1:-1]) if token.startswith('"') else int(token)
+
+
+class FakeValue:
+    def __init__(self, value):
+        self.value = value
+
+    def is_int(self):
+        return isinstance(self.value, int)
+
+    def is_string(self):
+        return isinstance(self.value, str)
+
+    def as_string(self):
+        return str(self.value)
+
+    def as_int(self):
+        return int(self.value)
+
+    def __str__(self):
+        return f'"{self.value}"' if isinstance(self.value, str) else str(self.value)
+
+
+class FakeRecord:
+    def __init__(self, values):
+        self._values = [FakeValue(v) for v in values]
+
+    def values(self):
+        return self._values
+
+
+class FakeResult:
+    def __init__(self, columns=(), rows=(), error=None):
+        self.columns = list(columns)
+        self._rows = [list(r) for r in rows]
+        self.error = error
+
+    def is_succeeded(self):
+        return self.error is None
+
+    def error_msg(self):
+        return self.error or ''
+
+    def keys(self):
+        return self.columns
+
+    def rows(self):
+        return self._rows
+
+    def row_size(self):
+        return len(self._rows)
+
+    def column_values(self, key):
+        i = self.columns.index(key)
+        return [FakeValue(r[i]) for r in self._rows]
+
+    def __iter__(self):
+        return iter(FakeRecord(r) for r in self._rows)
+
+
+class FakeGraph:
+    # 所有会话共享的"服务端"状态和调用统计
+    def __init__(self, latency=0.0, latency_per_kb=0.0, existing_titles=None, error_rate=0.0, seed=0,
+                 job_seconds=0.0, parameters=True, list_parameters=True):
+        self.lock = threading.Lock()
+        self.latency = latency                # 每次调用的固定延迟（秒）
+        self.latency_per_kb = latency_per_kb  # 每 KB 语句额外延迟（秒）
+        self.error_rate = error_rate          # INSERT 语句返回暂时性错误（主节点切换）的概率
+        self.random = random.Random(seed)
+        self.injected_errors = 0
+        self.spaces = set()
+        self.vid_types = {}                   # 图空间 -> vid_type
+        self.schema = set()                   # ('TAG'|'EDGE'|'TAG INDEX', 名称)
+        self.tag_index_fields = {}            # 标签 -> 该标签上各索引的属性列表
+        self.index_status = {}
+        self.vertices = {}                    # 标签 -> VID 集合
+        self.edges = {}                       # 边类型 -> (起点, 终点) 集合
+        self.paper_titles = {}                # 标题 -> VID，用于模拟 LOOKUP ON paper
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.statement_counts = {}            # 语句类型 -> 次数
+        self.job_seconds = job_seconds        # 模拟的统计作业执行时间（秒）
+        self.jobs = {}                        # 作业编号 -> (完成时间, 提交时的统计结果)
+        self.parameters = parameters          # 为 False 时模拟不支持参数化语句的服务端
+        self.list_parameters = list_parameters  # 为 False 时模拟不支持列表参数（IN $titles）的服务端
+        for i, title in enumerate(existing_titles or []):
+            self.paper_titles[title] = f'existing{i}'
+
+    def row_counts(self):
+        with self.lock:
+            return ({tag: len(v) for tag, v in self.vertices.items()},
+                    {edge: len(e) for edge, e in self.edges.items()})
+
+    def execute_parameter(self, stmt, params, space=None):
+        # 参数按字面量代入后与普通语句相同处理，模板或参数有误时返回与服务端类似的错误
+        if not self.parameters:
+            return FakeResult(error=f"SyntaxError: syntax error near `${next(iter(params), '')}'")
+        if not self.list_parameters and any(value.getType() == value.LVAL for value in params.values()):
+            return FakeResult(error='SemanticError: List parameters are not supported')
+        try:
+            stmt = substitute(stmt, {name: _python_value(value) for name, value in params.items()})
+        except KeyError as e:
+            return FakeResult(error=f'SemanticError: Parameter `{e.args[0]}` not found')
+        return self.execute(stmt, space)
+
+    def execute(self, stmt, space=None):
+        # space 为会话 USE 的图空间，用于检查语句中 VID 的类型
+        stmt = stmt.strip()
+        size = len(stmt.encode('utf-8'))
+        delay = self.latency + self.latency_per_kb * size / 1024
+        if delay:
+            time.sleep(delay)
+        kind = statement_kind(stmt)
+        with self.lock:
+            self.round_trips += 1
+            self.bytes_sent += size
+            self.statement_counts[kind] = self.statement_counts.get(kind, 0) + 1
+            return self._dispatch(stmt, space)
+
+    def _check_vids(self, space, tokens):
+        # 与服务端相同，VID 的类型必须与图空间的 vid_type 一致（整数或字符串）
+        vid_type = self.vid_types.get(space)
+        if vid_type is None:
+            return None
+        int_vid = vid_type.upper() == 'INT64'
+        for token in tokens:
+            if token.startswith('"') == int_vid:
+                return FakeResult(error=f'SemanticError: Wrong vid type `{token}\', the vid type of space is {vid_type}')
+        return None
+
+    def _dispatch(self, stmt, space=None):
+        upper = stmt.upper()
+        if self.error_rate and upper.startswith('INSERT') and self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            return FakeResult(error='Storage Error: The leader has changed. Try again later')
+        if upper.startswith('INSERT VERTEX'):
+            return self._check_vids(space, _VERTEX_ROW.findall(stmt)) or self._insert_vertex(stmt)
+        if upper.startswith('INSERT EDGE'):
+            error = self._check_vids(space, [vid for ids in _EDGE_ROW.findall(stmt) for vid in ids])
+            return error or self._insert_edge(stmt)
+        if upper.startswith('FETCH PROP ON'):
+            match = re.match(r'FETCH PROP ON \w+ (.*?) YIELD', stmt, re.I | re.S)
+            return self._check_vids(space, re.findall(_ID, match.group(1)) if match else []) or FakeResult()
+        if upper.startswith('LOOKUP ON PAPER'):
+            return self._lookup_paper(stmt)
+        if upper.startswith('DELETE VERTEX'):
+            vids = {_id(token) for token in re.findall(_ID, stmt[len('DELETE VERTEX'):])}
+            for tag_vids in self.vertices.values():
+                tag_vids.difference_update(vids)
+            return FakeResult()
+        if upper == 'SHOW SPACES':
+            return FakeResult(['Name'], [[s] for s in sorted(self.spaces)])
+        if upper.startswith('CREATE SPACE'):
+            space = re.search(r'EXISTS\s+(\w+)', stmt).group(1)
+            if space not in self.spaces:
+                self.spaces.add(space)
+                match = re.search(r'vid_type\s*=\s*(\w+(?:\(\d+\))?)', stmt, re.I)
+                self.vid_types[space] = match.group(1) if match else 'FIXED_STRING(8)'
+            return FakeResult()
+        if upper.startswith('DESCRIBE SPACE'):
+            space = stmt.split()[2]
+            if space not in self.spaces:
+                return FakeResult(error=f'SpaceNotFound: {space}')
+            return FakeResult(['Name', 'Vid Type'], [[space, self.vid_types.get(space, 'FIXED_STRING(8)')]])
+        if upper.startswith('USE '):
+            space = stmt.split()[1]
+            return FakeResult() if space in self.spaces else FakeResult(error=f'SpaceNotFound: {space}')
+        match = re.match(r'CREATE (TAG INDEX|TAG|EDGE) IF NOT EXISTS (\w+)', stmt)
+        if match:
+            if match.group(1) == 'TAG INDEX' and match.group(1, 2) not in self.schema:
+                tag, fields = re.search(r'ON (\w+)\((.*)\)', stmt).groups()
+                self.tag_index_fields.setdefault(tag, []).append(
+                    [f.split('(')[0].strip() for f in fields.split(',') if f.strip()])
+            self.schema.add((match.group(1), match.group(2)))
+            return FakeResult()
+        match = re.match(r'DESCRIBE (TAG INDEX|TAG|EDGE) (\w+)', stmt)
+        if match:
+            found = (match.group(1), match.group(2)) in self.schema
+            return FakeResult() if found else FakeResult(error=f'{match.group(2)} not found')
+        if upper.startswith('REBUILD TAG INDEX'):
+            self.index_status[stmt.split()[3]] = 'FINISHED'
+            return FakeResult()
+        if upper == 'SUBMIT JOB STATS':
+            # 统计结果取提交时的数据，作业完成后才能通过 SHOW STATS 看到
+            job_id = len(self.jobs) + 1
+            self.jobs[job_id] = (time.monotonic() + self.job_seconds,
+                                 ({tag: len(v) for tag, v in self.vertices.items()},
+                                  {edge: len(e) for edge, e in self.edges.items()}))
+            return FakeResult(['New Job Id'], [[job_id]])
+        if upper.startswith('SHOW JOB '):
+            job_id = int(stmt.split()[2])
+            if job_id not in self.jobs:
+                return FakeResult(error=f'Job not existed: {job_id}')
+            status = 'FINISHED' if time.monotonic() >= self.jobs[job_id][0] else 'RUNNING'
+            return FakeResult(['Job Id(TaskId)', 'Command(Dest)', 'Status', 'Start Time', 'Stop Time', 'Error Code'],
+                              [[job_id, 'STATS', status, '', '', 'SUCCEEDED']])
+        if upper == 'SHOW STATS':
+            finished = [job_id for job_id, (done_at, _) in self.jobs.items() if time.monotonic() >= done_at]
+            if not finished:
+                return FakeResult(error='There is no any stats info to show, please execute `submit job stats\' firstly!')
+            vertices, edges = self.jobs[max(finished)][1]
+            rows = [['Tag', tag, n] for tag, n in sorted(vertices.items())]
+            rows += [['Edge', edge, n] for edge, n in sorted(edges.items())]
+            rows += [['Space', 'vertices', sum(vertices.values())], ['Space', 'edges', sum(edges.values())]]
+            return FakeResult(['Type', 'Name', 'Count'], rows)
+        if upper == 'SHOW TAG INDEX STATUS':
+            return FakeResult(['Name', 'Index Status'], sorted(self.index_status.items()))
+        return FakeResult()
+
+    def _insert_vertex(self, stmt):
+        tag = re.match(r'INSERT VERTEX(?: IF NOT EXISTS)? (\w+)\(', stmt).group(1)
+        vids = self.vertices.setdefault(tag, set())
+        if tag == 'paper':
+            for vid, title in _PAPER_ROW.findall(stmt):
+                vids.add(_id(vid))
+                self.paper_titles.setdefault(unescape(title), _id(vid))
+        else:
+            vids.update(_id(vid) for vid in _VERTEX_ROW.findall(stmt))
+        return FakeResult()
+
+    def _insert_edge(self, stmt):
+        edge = re.match(r'INSERT EDGE(?: IF NOT EXISTS)? (\w+)\(', stmt).group(1)
+        self.edges.setdefault(edge, set()).update((_id(src), _id(dst)) for src, dst in _EDGE_ROW.findall(stmt))
+        return FakeResult()
+
+    def _lookup_paper(self, stmt):
+        # 与服务端相同，LOOKUP 需要标签上的索引，按属性过滤时需要以该属性开头的索引
+        indexes = self.tag_index_fields.get('paper', [])
+        if not indexes or ('WHERE' in stmt and not any(fields[:1] == ['title'] for fields in indexes)):
+            return FakeResult(error='SemanticError: There is no index to use at runtime')
+        if 'WHERE' not in stmt:
+            rows = [[t, v] for t, v in self.paper_titles.items()]
+            if 'LIMIT 1' in stmt:
+                return FakeResult(['id(VERTEX)'], [[v] for _, v in rows[:1]])
+            return FakeResult(['title', 'vid'], rows)
+        if ' IN [' in stmt:
+            titles = [unescape(t) for t in _QUOTED.findall(stmt[stmt.index(' IN ['):stmt.index('] YIELD')])]
+            return FakeResult(['title', 'vid'], [[t, self.paper_titles[t]] for t in titles if t in self.paper_titles])
+        title = unescape(_QUOTED.search(stmt[stmt.index('=='):]).group(1))
+        vid = self.paper_titles.get(title)
+        return FakeResult(['id(VERTEX)'], [[vid]] if vid is not None else [])
+
+
+def _python_value(value):
+    # 客户端参数 Value -> Python 值
+    if value.getType() == value.NVAL:
+        return None
+    if value.getType() == value.LVAL:
+        return [_python_value(v) for v in value.get_lVal().values]
+    return value.value
+
+
+class FakeSession:
+    def __init__(self, graph, pool=None):
+        self.graph = graph
+        self.pool = pool
+        self.space = None  # USE 成功后的当前图空间
+
+    def _check_host(self):
+        # 模拟一个 graphd 的额外延迟和宕机
+        if self.pool is not None:
+            if self.pool.down:
+                raise ConnectionError(f"Connection refused: {self.pool.name}")
+            if self.pool.latency:
+                time.sleep(self.pool.latency)
+
+    def execute(self, stmt):
+        self._check_host()
+        result = self.graph.execute(stmt, self.space)
+        if result.is_succeeded() and stmt.strip().upper().startswith('USE '):
+            self.space = stmt.split()[1]
+        return result
+
+    def execute_parameter(self, stmt, params):
+        self._check_host()
+        return self.graph.execute_parameter(stmt, params, self.space)
+
+    def release(self):
+        pass
+
+
+class FakeConnectionPool:
+    # 与 nebula3.gclient.net.ConnectionPool 相同的使用方式。多个连接池可以共用同一个 FakeGraph，
+    # 模拟连接到同一集群的多个 graphd：latency 为该 graphd 每次调用的额外延迟（秒），down 为 True 时调用抛出连接错误
+    def __init__(self, graph=None, latency=0.0, name='fake'):
+        self.graph = graph or FakeGraph()
+        self.latency = latency
+        self.name = name
+        self.down = False
+
+    def init(self, addresses, config=None):
+        return True
+
+    def get_session(self, user, password):
+        if self.down:
+            raise ConnectionError(f"Connection refused: {self.name}")
+        return FakeSession(self.graph, self)
+
+    @contextmanager
+    def session_context(self, user, password):
+        session = self.get_session(user, password)
+        try:
+            yield session
+        finally:
+            session.release()
+
+    def close(self):
+        pass
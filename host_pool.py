@@ -0,0 +1,258 @@
+# 多个 graphd 的负载均衡连接池：每个 graphd 一个连接池，每条语句按各主机观测到的延迟和在途请求数选择主机，
+# 连续失败的主机暂停使用，由后台线程做健康检查，恢复后重新加入。用法与 nebula3 的 ConnectionPool 相同
+import threading
+import time
+from contextlib import contextmanager
+
+from nebula_batch import is_retryable
+
+# 延迟指数滑动平均的权重
+LATENCY_ALPHA = 0.2
+# 连续失败多少次后暂停使用该主机
+MAX_FAILURES = 3
+# 对暂停使用的主机做健康检查的间隔（秒）
+CHECK_INTERVAL = 5
+
+
+# "host1:9669,host2:9669" -> [('host1', 9669), ('host2', 9669)]
+def parse_hosts(text):
+    hosts = []
+    for item in text.split(','):
+        if item.strip():
+            host, port = item.strip().rsplit(':', 1)
+            hosts.append((host, int(port)))
+    return hosts
+
+
+# 默认的连接池工厂：为一个 graphd 创建并初始化 nebula3 连接池
+def nebula_pool_factory(config=None):
+    def create(address):
+        from nebula3.gclient.net import ConnectionPool
+        pool = ConnectionPool()
+        if not pool.init([address], config):
+            pool.close()
+            raise RuntimeError(f"无法连接 graphd {address[0]}:{address[1]}")
+        return pool
+    return create
+
+
+class HostState:
+    # 一个 graphd 的连接池和统计，所有字段都在 BalancedConnectionPool.lock 保护下修改
+    def __init__(self, address):
+        self.address = address
+        self.pool = None
+        self.latency = None    # 语句延迟的指数滑动平均（秒），还没有请求时为 None
+        self.in_flight = 0
+        self.failures = 0      # 连续失败次数
+        self.healthy = False
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def name(self):
+        return f'{self.address[0]}:{self.address[1]}'
+
+    def score(self):
+        # 预计的等待时间：平均延迟 × (在途请求数 + 1)，有连续失败时成倍放大。
+        # 还没有延迟数据的主机优先使用，以便尽快得到观测值
+        return (self.latency or 0.0) * (self.in_flight + 1) * (self.failures + 1)
+
+
+class BalancedConnectionPool:
+    def __init__(self, hosts, config=None, pool_factory=None, check_interval=CHECK_INTERVAL,
+                 max_failures=MAX_FAILURES):
+        self.pool_factory = pool_factory or nebula_pool_factory(config)
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self.lock = threading.Lock()
+        self.hosts = [HostState(tuple(address)) for address in hosts]
+        self.credentials = None  # 健康检查使用的用户名和密码，取第一次 get_session 时的值
+        self.stopped = threading.Event()
+        for host in self.hosts:
+            self._connect(host)
+        if not any(host.healthy for host in self.hosts):
+            raise RuntimeError(f"所有 graphd 都无法连接: {', '.join(host.name for host in self.hosts)}")
+        self.checker = threading.Thread(target=self._check_loop, daemon=True)
+        self.checker.start()
+
+    def _connect(self, host):
+        try:
+            pool = self.pool_factory(host.address)
+        except Exception as e:
+            print(f"graphd {host.name} 不可用: {e}")
+            return False
+        with self.lock:
+            host.pool = pool
+            host.healthy = True
+            host.failures = 0
+            host.latency = None
+        return True
+
+    def get_session(self, user, password):
+        if self.credentials is None:
+            self.credentials = (user, password)
+        return BalancedSession(self, user, password)
+
+    @contextmanager
+    def session_context(self, user, password):
+        session = self.get_session(user, password)
+        try:
+            yield session
+        finally:
+            session.release()
+
+    def close(self):
+        self.stopped.set()
+        self.checker.join()
+        for host in self.hosts:
+            if host.pool is not None:
+                host.pool.close()
+                host.pool = None
+
+    def acquire(self, exclude=()):
+        # 选择预计等待时间最短的健康主机，exclude 中的主机（本条语句已经失败过的）不选；
+        # 没有健康主机时选择连续失败次数最少的主机，由调用方的重试逻辑等待恢复。没有可选的主机时返回 None
+        with self.lock:
+            usable = [h for h in self.hosts if h.pool is not None and h.address not in exclude]
+            candidates = [h for h in usable if h.healthy]
+            if candidates:
+                host = min(candidates, key=HostState.score)
+            elif usable:
+                host = min(usable, key=lambda h: h.failures)
+            else:
+                return None
+            host.in_flight += 1
+            host.requests += 1
+            return host
+
+    def release(self, host, seconds, failed):
+        with self.lock:
+            host.in_flight -= 1
+            if failed:
+                host.errors += 1
+                host.failures += 1
+                # 失败的耗时也计入延迟，重试时优先选择其他主机
+                host.latency = max(host.latency or 0.0, seconds)
+                if host.healthy and host.failures >= self.max_failures:
+                    host.healthy = False
+                    print(f"graphd {host.name} 连续失败 {host.failures} 次，暂停使用，之后的语句改发到其他主机")
+                return
+            host.failures = 0
+            host.latency = seconds if host.latency is None else \
+                host.latency + LATENCY_ALPHA * (seconds - host.latency)
+
+    def _check_loop(self):
+        while not self.stopped.wait(self.check_interval):
+            for host in self.hosts:
+                if not host.healthy:
+                    self._check(host)
+
+    def _check(self, host):
+        # 暂停使用的主机执行一条简单语句成功后恢复；连接池创建失败的主机重新创建
+        if host.pool is None:
+            if self._connect(host):
+                print(f"graphd {host.name} 已恢复")
+            return
+        if self.credentials is None:
+            return
+        try:
+            with host.pool.session_context(*self.credentials) as session:
+                ok = session.execute('YIELD 1').is_succeeded()
+        except Exception:
+            ok = False
+        if ok:
+            with self.lock:
+                host.healthy = True
+                host.failures = 0
+                host.latency = None
+            print(f"graphd {host.name} 已恢复")
+
+    def stats(self):
+        with self.lock:
+            return [{'host': h.name, 'healthy': h.healthy, 'requests': h.requests, 'errors': h.errors,
+                     'latency_ms': round(h.latency * 1000, 3) if h.latency is not None else None}
+                    for h in self.hosts]
+
+    def print_summary(self):
+        print("各 graphd 的请求分布:")
+        for s in self.stats():
+            state = '正常' if s['healthy'] else '暂停'
+            latency = f"{s['latency_ms']:.1f} 毫秒" if s['latency_ms'] is not None else '-'
+            print(f"  {s['host']}: {s['requests']} 次请求，失败 {s['errors']} 次，平均延迟 {latency}，{state}")
+
+
+class BalancedSession:
+    # 与 nebula3 的 Session 用法相同，但不是线程安全的（执行器每个线程一个会话）。每个主机上按需打开一个会话，
+    # 每条语句单独选择主机；USE 语句会记录下来，在之后打开的会话上先执行，保证所有会话都在同一个图空间中
+    def __init__(self, balancer, user, password):
+        self.balancer = balancer
+        self.user = user
+        self.password = password
+        self.sessions = {}   # 主机地址 -> 会话
+        self.use_stmt = None
+
+    def execute(self, stmt):
+        if not stmt.strip().upper().startswith('USE '):
+            return self._call(lambda s: s.execute(stmt))
+        # 已经打开的会话关闭，下次使用时重新打开并先执行这条 USE；执行失败时（例如图空间尚未同步）不记录
+        for address in list(self.sessions):
+            self._drop(address)
+        result = self._call(lambda s: s.execute(stmt))
+        if result.is_succeeded():
+            self.use_stmt = stmt
+        return result
+
+    def execute_parameter(self, stmt, params):
+        return self._call(lambda s: s.execute_parameter(stmt, params))
+
+    def _session(self, host):
+        # 返回 (会话, None)；新打开的会话切换图空间失败时返回 (None, 失败结果)
+        session = self.sessions.get(host.address)
+        if session is None:
+            session = host.pool.get_session(self.user, self.password)
+            if self.use_stmt is not None:
+                result = session.execute(self.use_stmt)
+                if not result.is_succeeded():
+                    session.release()
+                    return None, result
+            self.sessions[host.address] = session
+        return session, None
+
+    def _drop(self, address):
+        session = self.sessions.pop(address, None)
+        if session is not None:
+            try:
+                session.release()
+            except Exception:
+                pass
+
+    def _call(self, call):
+        # 连接断开等异常说明主机本身有问题，立即换一个主机重新执行，所有主机都失败时抛出最后一个异常
+        tried = set()
+        error = None
+        while True:
+            host = self.balancer.acquire(tried)
+            if host is None:
+                if error is None:
+                    raise ConnectionError("没有可用的 graphd")
+                raise error
+            start = time.perf_counter()
+            try:
+                session, result = self._session(host)
+                if session is not None:
+                    result = call(session)
+            except Exception as e:
+                # 丢弃该主机上的会话，下次使用时重新打开
+                self.balancer.release(host, time.perf_counter() - start, True)
+                self._drop(host.address)
+                tried.add(host.address)
+                error = e
+                continue
+            # 只有暂时性错误计为主机失败，语法、数据等错误与主机无关；暂时性错误由调用方决定是否重试
+            failed = not result.is_succeeded() and is_retryable(result.error_msg())
+            self.balancer.release(host, time.perf_counter() - start, failed)
+            return result
+
+    def release(self):
+        for address in list(self.sessions):
+            self._drop(address)
@@ -0,0 +1,144 @@
+# 一次导入运行中各阶段共用的资源：连接池、图空间和账号、指标、失败记录、VID登记表，以及导出模式下的 CSV 导出器。
+# 独立运行的导入脚本和 pipeline.py 都通过它取得会话和执行器，阶段本身不关心输出到哪里
+import os
+from contextlib import contextmanager
+
+from csv_export import CsvExporter
+from dead_letter import DeadLetterFile
+from metrics import Metrics, InstrumentedSession
+from nebula_batch import StatementBatcher, literal, probe_parameters
+from nebula_executor import ParallelExecutor
+from schema import SchemaBootstrap, space_options, vid_is_int
+from title_index import TITLE_LOOKUP, TITLES_LOOKUP
+from verify import ExpectedRows, verify_load
+from vid_registry import open_vid_registry
+
+
+class LoadContext:
+    def __init__(self, connection_pool, data_dir, space, user, password, tags, edges, tag_indexes=None,
+                 backend='nebula', export_dir=None, executor_workers=8, vid_scheme='registry',
+                 metrics_name='import', metrics_interval=0, config_name='importer.yaml', verify_timeout=600, batch_max_rows=500, batch_max_bytes=1024 * 1024, use_parameters=True):
+        self.connection_pool = connection_pool
+        self.data_dir = data_dir
+        self.space = space
+        self.user = user
+        self.password = password
+        self.tags = tags
+        self.edges = edges
+        self.tag_indexes = tag_indexes or {}
+        self.executor_workers = executor_workers
+        self.batch_max_rows = batch_max_rows
+        self.batch_max_bytes = batch_max_bytes
+        # 是否使用参数化语句，apply_schema() 中探测到服务端不支持时改为 False
+        self.use_parameters = use_parameters
+        self.verify_timeout = verify_timeout
+        self.metrics_name = metrics_name
+        self.space_options = space_options(vid_scheme)
+
+        # 分阶段计时和按语句类型的延迟统计，结束时写出 JSON 报告和 Prometheus 文本文件
+        self.metrics = Metrics()
+        self.metrics_json_path = self.path(f'{metrics_name}_metrics.json')
+        self.metrics_prom_path = self.path(f'{metrics_name}_metrics.prom')
+        if metrics_interval:
+            self.metrics.start_snapshots(metrics_interval, self.metrics_json_path, self.metrics_prom_path)
+        # 重试后仍无法写入的行，所有阶段写入同一个文件，可以用 dead_letter.py 重放
+        self.dead_letters = DeadLetterFile(self.path('dead_letters.jsonl'))
+
+        self.exporter = None
+        if backend == 'csv':
+            # 导出模式不连接图数据库，所有阶段写入同一个导出器
+            self.exporter = CsvExporter(export_dir or self.path('csv_export'), space, tags, edges, self.tag_indexes,
+                                        space_options=self.space_options, config_name=config_name,
+                                        user=user, password=password)
+        # 持久化的VID登记表，按 (实体类型, 名称) 区分，重复运行和各个阶段都复用同一套VID；
+        # 哈希方案不需要登记表，VID 直接由名称计算
+        self.vid_registry = open_vid_registry(self.path('vid_registry.db'), vid_scheme)
+        # 本地去重后生成过的行，导入后与服务端的统计比较；导出模式不连接图数据库，不需要记录。
+        # 导入从不删除图中已有的顶点和边，全量导入也在之前记录的基础上累积
+        self.expected = None
+        if self.exporter is None:
+            self.expected = ExpectedRows(self.path(f'expected_rows_{space}.npz'))
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    @contextmanager
+    def session(self, use_space=True):
+        # 阶段自己的会话（会话不是线程安全的，并发的阶段各用一个）；导出模式下为 None
+        if self.exporter is not None:
+            yield None
+            return
+        with self.connection_pool.session_context(self.user, self.password) as session:
+            session = InstrumentedSession(session, self.metrics)
+            if use_space:
+                result = session.execute(f'USE {self.space}')
+                if not result.is_succeeded():
+                    raise RuntimeError(f"切换图空间 {self.space} 失败: {result.error_msg()}")
+            yield session
+
+    def executor(self):
+        # 两种输出方式使用相同的语句生成逻辑，CSV 导出器与执行器的用法相同
+        if self.exporter is not None:
+            return self.exporter
+        return ParallelExecutor(self.connection_pool, self.space, workers=self.executor_workers,
+                                user=self.user, password=self.password, metrics=self.metrics,
+                                dead_letters=self.dead_letters, use_parameters=self.use_parameters)
+
+    def batcher(self):
+        # 按标签/边类型合并的批量插入语句，每个阶段一个
+        return StatementBatcher(max_rows=self.batch_max_rows, max_bytes=self.batch_max_bytes)
+
+    def execute(self, phase, batches, source_progress=None):
+        # 执行一个阶段的批次流，同时记录生成的行
+        with self.metrics.timer(phase), self.executor() as executor:
+            if self.expected is not None:
+                batches = self.expected.track(batches)
+            return executor.execute_stream(batches, source_progress=source_progress)
+
+    def apply_schema(self):
+        # 创建图空间及标签、边类型和索引，轮询直到真正可用后再开始导入
+        if self.exporter is not None:
+            return
+        with self.metrics.timer('schema'), self.session(use_space=False) as session:
+            SchemaBootstrap(session, self.space, tags=self.tags, edges=self.edges, tag_indexes=self.tag_indexes,
+                            space_options=self.space_options).apply()
+            if self.use_parameters:
+                self._probe_parameters(session)
+
+    def _probe_parameters(self, session):
+        # 导入使用的每种参数化语句各探测一次：VID 位置的参数、标题等值查询和列表参数的 IN 查询，
+        # 任意一种不支持时所有阶段改用字面量语句。写入的探测顶点使用导入不会生成的VID，探测后立即删除
+        vid = -1 if vid_is_int(self.space_options) else '#param_probe'
+        tag = next(iter(self.tags))
+        error = probe_parameters(session, [(f'INSERT VERTEX IF NOT EXISTS {tag}() VALUES $v:()', {'v': vid}),
+                                           (TITLE_LOOKUP, {'title': ''}),
+                                           (TITLES_LOOKUP, {'titles': ['']})])
+        result = session.execute(f'DELETE VERTEX {literal(vid)}')
+        if not result.is_succeeded():
+            # 留在图中的探测顶点会使导入后的校验失败，不能继续
+            raise RuntimeError(f"删除参数探测顶点 {literal(vid)} 失败，请手动删除: {result.error_msg()}")
+        if error is not None:
+            self.use_parameters = False
+            print(f"服务端不支持参数化语句，改为把参数按字面量写入语句: {error[:300]}")
+
+    def verify(self):
+        # 一个统计作业确认写入结果，差异报告写入 data_dir；导出模式返回 None
+        if self.exporter is None:
+            self.expected.save()
+            with self.metrics.timer('verify'), self.session() as session:
+                return verify_load(session, self.expected.counts(), self.tags, self.edges, self.verify_timeout,
+                                   self.path(f'{self.metrics_name}_verify.json'))
+        return None
+
+    def close(self):
+        self.vid_registry.close()
+        if self.expected is not None:
+            self.expected.save()
+        if self.exporter is not None:
+            print(f"CSV 文件和导入配置已写入 {self.exporter.output_dir}，"
+                  f"使用 nebula-importer --config {self.exporter.config_path} 导入")
+        self.dead_letters.close()
+        self.dead_letters.report()
+        self.metrics.stop_snapshots()
+        self.metrics.write(self.metrics_json_path, self.metrics_prom_path)
+        self.metrics.print_summary()
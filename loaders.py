@@ -0,0 +1,112 @@
+# 输入加载：Excel 表格缓存为列式快照，output.json 按记录流式解析
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+
+import pandas as pd
+
+# 只用于判断能否写 Parquet，不需要导入
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _snapshot_key(path, usecols):
+    # 文件路径、修改时间、大小和读取的列共同决定快照是否有效
+    stat = os.stat(path)
+    raw = json.dumps([os.path.abspath(path), stat.st_mtime_ns, stat.st_size, list(usecols or [])], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+# 读取 Excel，结果缓存为 Parquet（没有 pyarrow 时用 pickle）快照，文件未变化时直接读快照
+def read_excel_cached(path, usecols=None, cache_dir=None):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), '.snapshot_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = os.path.basename(path) + '.'
+    suffix = '.parquet' if HAS_PYARROW else '.pkl'
+    snapshot = os.path.join(cache_dir, prefix + _snapshot_key(path, usecols) + suffix)
+    if os.path.exists(snapshot):
+        if HAS_PYARROW:
+            return pd.read_parquet(snapshot)
+        with open(snapshot, 'rb') as f:
+            return pickle.load(f)
+
+    data_df = pd.read_excel(path, usecols=usecols)
+    # 删除同一文件的旧快照
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix):
+            os.remove(os.path.join(cache_dir, name))
+    tmp = snapshot + '.tmp'
+    try:
+        if HAS_PYARROW:
+            data_df.to_parquet(tmp)
+        else:
+            with open(tmp, 'wb') as f:
+                pickle.dump(data_df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+    except Exception as e:
+        # 快照只是加速手段，写入失败（如列类型混杂无法转换为 Parquet）时照常返回数据
+        print(f"写入表格快照失败: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return data_df
+
+
+def _iter_json_array(file, chunk_size=1 << 16):
+    # 不依赖 ijson 的增量解析：逐块读取顶层数组，每解析出一个完整元素就交出
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    read_size = chunk_size
+    while True:
+        # 跳过空白和元素之间的逗号
+        while pos < len(buffer) and buffer[pos] in (' \t\r\n,' if started else ' \t\r\n'):
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("JSON 数组不完整")
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError("output.json 的顶层必须是数组")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            record, end = None, len(buffer)
+        if end >= len(buffer) and not eof:
+            # 元素可能被截断（或是恰好到缓冲区末尾的数字），读入更多数据后重新解析
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            read_size *= 2
+            continue
+        yield record
+        pos = end
+        read_size = chunk_size
+
+
+# 流式读取 output.json 中的论文记录，内存占用与单条记录大小相关，而不是整个文件
+def iter_json_records(path):
+    if ijson is not None:
+        with open(path, 'rb') as file:
+            yield from ijson.items(file, 'item', use_float=True)
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            yield from _iter_json_array(file)
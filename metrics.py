@@ -0,0 +1,211 @@
+# 导入过程的指标采集：分阶段计时、按语句类型统计次数/字节/延迟直方图，输出 JSON 报告和 Prometheus 文本文件
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# 延迟直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# 语句类型，例如 "INSERT VERTEX paper"、"INSERT EDGE which_author"、"LOOKUP ON paper"
+def statement_kind(stmt):
+    match = re.match(r'\s*(INSERT (?:VERTEX|EDGE))(?: IF NOT EXISTS)? (\w+)|\s*(LOOKUP ON) (\w+)', stmt)
+    if match:
+        return f'{match.group(1) or match.group(3)} {match.group(2) or match.group(4)}'
+    return ' '.join(stmt.split(None, 2)[:2])
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.bytes = 0
+        self.failures = 0
+
+    def observe(self, seconds, nbytes, ok):
+        self.count += 1
+        self.sum += seconds
+        self.bytes += nbytes
+        if not ok:
+            self.failures += 1
+        for i, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                self.buckets[i] += 1
+                break
+
+    def to_dict(self):
+        cumulative = []
+        total = 0
+        for upper, n in zip(LATENCY_BUCKETS, self.buckets):
+            total += n
+            cumulative.append([upper, total])
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'seconds_sum': self.sum,
+            'seconds_avg': self.sum / self.count if self.count else 0,
+            'buckets': cumulative,
+        }
+
+
+class Metrics:
+    def __init__(self, name='nebula_loader'):
+        self.name = name
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.statements = {}   # 语句类型 -> _Histogram
+        self.phases = {}       # 阶段名 -> [次数, 总耗时]
+        self.snapshot_thread = None
+        self.snapshot_stop = threading.Event()
+
+    def observe_statement(self, stmt, seconds, ok, extra_bytes=0):
+        kind = statement_kind(stmt)
+        nbytes = len(stmt.encode('utf-8')) + extra_bytes
+        with self.lock:
+            hist = self.statements.get(kind)
+            if hist is None:
+                hist = self.statements[kind] = _Histogram()
+            hist.observe(seconds, nbytes, ok)
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            entry = self.phases.setdefault(phase, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def timed_iter(self, phase, iterable):
+        # 累计从迭代器取下一个元素的耗时，例如生成语句时等待并行清理结果的时间
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add_time(phase, time.perf_counter() - start)
+            yield item
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'started_at': self.started,
+                'elapsed_seconds': time.time() - self.started,
+                'phases': {p: {'calls': n, 'seconds': s} for p, (n, s) in self.phases.items()},
+                'statements': {k: h.to_dict() for k, h in self.statements.items()},
+            }
+
+    def to_prometheus(self):
+        report = self.to_dict()
+        name = self.name
+        lines = [
+            f'# HELP {name}_phase_seconds_total Wall time spent in each loader phase.',
+            f'# TYPE {name}_phase_seconds_total counter',
+        ]
+        for phase, p in report['phases'].items():
+            lines.append(f'{name}_phase_seconds_total{{phase="{_escape(phase)}"}} {p["seconds"]:.6f}')
+        lines += [
+            f'# HELP {name}_statement_seconds Latency of statements sent to graphd, by statement kind.',
+            f'# TYPE {name}_statement_seconds histogram',
+        ]
+        for kind, h in report['statements'].items():
+            label = f'kind="{_escape(kind)}"'
+            for upper, n in h['buckets']:
+                lines.append(f'{name}_statement_seconds_bucket{{{label},le="{upper}"}} {n}')
+            lines.append(f'{name}_statement_seconds_bucket{{{label},le="+Inf"}} {h["count"]}')
+            lines.append(f'{name}_statement_seconds_sum{{{label}}} {h["seconds_sum"]:.6f}')
+            lines.append(f'{name}_statement_seconds_count{{{label}}} {h["count"]}')
+        for metric, field, help_text in (('statement_bytes_total', 'bytes', 'Bytes of statement text sent.'),
+                                         ('statement_failures_total', 'failures', 'Statements that did not succeed.')):
+            lines.append(f'# HELP {name}_{metric} {help_text}')
+            lines.append(f'# TYPE {name}_{metric} counter')
+            for kind, h in report['statements'].items():
+                lines.append(f'{name}_{metric}{{kind="{_escape(kind)}"}} {h[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path=None, prometheus_path=None):
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.to_prometheus())
+
+    def start_snapshots(self, interval, json_path=None, prometheus_path=None):
+        # 运行期间每隔 interval 秒写一次快照，便于观察长时间运行的导入
+        def loop():
+            while not self.snapshot_stop.wait(interval):
+                self.write(json_path, prometheus_path)
+        self.snapshot_stop.clear()
+        self.snapshot_thread = threading.Thread(target=loop, daemon=True)
+        self.snapshot_thread.start()
+
+    def stop_snapshots(self):
+        if self.snapshot_thread is not None:
+            self.snapshot_stop.set()
+            self.snapshot_thread.join()
+            self.snapshot_thread = None
+
+    def print_summary(self):
+        report = self.to_dict()
+        print("各阶段耗时:")
+        for phase, p in report['phases'].items():
+            print(f"  {phase}: {p['seconds']:.2f} 秒（{p['calls']} 次）")
+        print("各类语句:")
+        for kind, h in sorted(report['statements'].items(), key=lambda kv: -kv[1]['seconds_sum']):
+            print(f"  {kind}: {h['count']} 次，{h['bytes']} 字节，平均 {h['seconds_avg'] * 1000:.1f} 毫秒，失败 {h['failures']} 次")
+
+
+class InstrumentedSession:
+    # 包装会话，记录每条语句的类型、字节数和延迟；其余属性直接转发给原会话
+    def __init__(self, session, metrics):
+        self.session = session
+        self.metrics = metrics
+
+    def execute(self, stmt):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = self.session.execute(stmt)
+            ok = result.is_succeeded()
+            return result
+        finally:
+            self.metrics.observe_statement(stmt, time.perf_counter() - start, ok)
+
+    def execute_parameter(self, stmt, params):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = self.session.execute_parameter(stmt, params)
+            ok = result.is_succeeded()
+            return result
+        finally:
+            # 字节数按语句模板加上字符串参数计算
+            extra = sum(len(v.value.encode('utf-8')) for v in params.values() if isinstance(v.value, str))
+            self.metrics.observe_statement(stmt, time.perf_counter() - start, ok, extra)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, text):
+    # Prometheus textfile collector 要求文件整体替换，先写临时文件再重命名
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,285 @@
+# 批量语句构造：把同一标签/边类型的多行数据合并成一条多值 INSERT 语句，减少网络往返。
+# 行中的 VID 和属性值保持为 Python 值，执行时作为参数传递（execute_parameter），值的转义只在 literal() 一处
+import functools
+import numbers
+import random
+import re
+import time
+
+from nebula3.common.ttypes import NList, NullType, Value
+
+from dedup import Int64Set, key64
+
+VERTEX = 'VERTEX'
+EDGE = 'EDGE'
+
+_PARAMETER = re.compile(r'\$(\w+)')
+_STRING_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_ESCAPED = re.compile(r'[\\"\n\r\t]')
+_UNESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+# 可重试的错误：主节点切换、RPC/会话超时、存储繁忙、写冲突等暂时性问题；其余错误（语法、schema、数据本身）视为致命
+RETRYABLE_ERRORS = (
+    'leader', 'e_leader_changed', 'timeout', 'timed out', 'e_rpc_failure', 'rpc failure', 'session',
+    'busy', 'write write conflict', 'e_write_write_conflict', 'more than one request', 'connection',
+    'broken pipe', 'try again', 'e_raft',
+)
+# 单个批次最多执行的次数（包括第一次）和重试等待时间（秒）
+MAX_ATTEMPTS = 5
+RETRY_INITIAL_DELAY = 0.2
+RETRY_MAX_DELAY = 5
+
+
+def is_retryable(error):
+    error = error.lower()
+    return any(pattern in error for pattern in RETRYABLE_ERRORS)
+
+
+# Python 值的 nGQL 字面量，所有拼接进语句文本的值都经过这里转义
+def literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+    if isinstance(value, (list, tuple)):
+        return f'[{", ".join(literal(v) for v in value)}]'
+    return '"' + _ESCAPED.sub(lambda m: _STRING_ESCAPES[m.group()], str(value)) + '"'
+
+
+# literal() 中字符串转义的逆过程（不含两端引号）
+def unescape(text):
+    return re.sub(r'\\(.)', lambda m: _UNESCAPES.get(m.group(1), m.group(1)), text, flags=re.S)
+
+
+# 把语句模板中的 $参数 替换为字面量
+def substitute(stmt, params):
+    return _PARAMETER.sub(lambda m: literal(params[m.group(1)]), stmt)
+
+
+# Python 值转换为客户端参数使用的 Value
+def to_value(value):
+    result = Value()
+    if value is None:
+        result.set_nVal(NullType.__NULL__)
+    elif isinstance(value, bool):
+        result.set_bVal(value)
+    elif isinstance(value, numbers.Integral):
+        result.set_iVal(int(value))
+    elif isinstance(value, numbers.Real):
+        result.set_fVal(float(value))
+    elif isinstance(value, (list, tuple)):
+        result.set_lVal(NList(values=[to_value(v) for v in value]))
+    else:
+        result.set_sVal(str(value))
+    return result
+
+
+# 执行一条语句，params 为 参数名 -> Python 值，没有参数时直接执行。
+# use_parameters 为 True 时用参数化执行，同一形状（类型、名称、属性、行数）的批次共用一个语句模板；
+# 为 False 时把参数按字面量代入语句后用 execute 执行，适用于不支持参数的服务端或客户端
+def run_statement(session, stmt, params=None, use_parameters=True):
+    if not params:
+        return session.execute(stmt)
+    if use_parameters:
+        return session.execute_parameter(stmt, {name: to_value(value) for name, value in params.items()})
+    return session.execute(substitute(stmt, params))
+
+
+# 启动时各执行一次参数化的探测语句（probes 为 (语句, 参数) 列表），返回第一个失败的原因，都成功时返回 None
+def probe_parameters(session, probes):
+    for stmt, params in probes:
+        try:
+            result = run_statement(session, stmt, params)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        if not result.is_succeeded():
+            return result.error_msg()
+    return None
+
+
+# 一行的参数占位：顶点 $v0:($p0_0, ...)，边 $s0->$d0:($p0_0, ...)
+def _row_template(kind, i, width):
+    ids = f'$v{i}' if kind == VERTEX else f'$s{i}->$d{i}'
+    return f'{ids}:({", ".join(f"$p{i}_{j}" for j in range(width))})'
+
+
+# 同一形状的批次共用语句模板，装满的批次行数都相同，模板只需生成一次
+@functools.lru_cache(maxsize=256)
+def _statement_template(kind, name, props, if_not_exists, rows, width):
+    if_not_exists = ' IF NOT EXISTS' if if_not_exists else ''
+    values = ', '.join(_row_template(kind, i, width) for i in range(rows))
+    return f'INSERT {kind}{if_not_exists} {name}({props}) VALUES {values}'
+
+
+def _row_bytes(row):
+    # 行的大致字节数（加上分隔符），用于限制单条语句的大小
+    ids, values = row
+    return sum(len(v.encode('utf-8')) + 4 if isinstance(v, str) else 8 for v in (*ids, *values)) + 6
+
+
+class StatementBatch:
+    # 一条多值 INSERT 语句及其包含的所有行，失败时可以拆分重试
+    def __init__(self, kind, name, props, rows, if_not_exists=True):
+        self.kind = kind      # VERTEX 或 EDGE
+        self.name = name      # 标签名或边类型名
+        self.props = props    # 属性列表文本，例如 "title, abstract"
+        # 每行为 ((VID,) 或 (起点, 终点), (属性值, ...))
+        self.rows = rows
+        self.if_not_exists = if_not_exists  # 为 False 时覆盖已有数据（增量导入中内容有变化的行）
+
+    def __len__(self):
+        return len(self.rows)
+
+    def statement(self):
+        # 返回 (语句, 参数)。VID 和属性值都作为参数，语句是同一形状的批次共用的模板
+        params = {}
+        for i, (ids, values) in enumerate(self.rows):
+            if self.kind == VERTEX:
+                params[f'v{i}'] = ids[0]
+            else:
+                params[f's{i}'], params[f'd{i}'] = ids
+            for j, value in enumerate(values):
+                params[f'p{i}_{j}'] = value
+        width = len(self.rows[0][1]) if self.rows else 0
+        return _statement_template(self.kind, self.name, self.props, self.if_not_exists, len(self.rows), width), params
+
+    def row_text(self, row):
+        # 一行的字面量文本，用于失败记录
+        ids, values = row
+        return f'{"->".join(literal(v) for v in ids)}:({", ".join(literal(v) for v in values)})'
+
+    def split(self):
+        # 对半拆分，用于批量失败后定位出错的行
+        mid = len(self.rows) // 2
+        return (StatementBatch(self.kind, self.name, self.props, self.rows[:mid], self.if_not_exists),
+                StatementBatch(self.kind, self.name, self.props, self.rows[mid:], self.if_not_exists))
+
+
+class StatementBatcher:
+    # 按 (类型, 名称, 属性, 是否 IF NOT EXISTS) 分组缓存待插入的行，达到行数或字节上限时生成一条批量语句
+    def __init__(self, max_rows=500, max_bytes=1024 * 1024, dedup_edges=True):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        # (kind, name, props, if_not_exists) -> [行列表, 当前字节数, 附加信息]。附加信息对顶点分组是各行的 VID，
+        # 对边分组是这些边引用的、尚未封装的顶点分组（None 表示可能引用任何顶点分组）
+        self.groups = {}
+        self.ready = []   # 已经装满的批次
+        self.pending_vertices = {}  # 尚未封装的顶点行的 VID -> 所在分组
+        # 已经生成过的边 (边类型, 起点, 终点) 的 64 位哈希键，重复的边不再生成语句
+        self.edge_keys = Int64Set() if dedup_edges else None
+        self.duplicate_edges = 0
+
+    def add_vertex(self, tag, props, vid, values, if_not_exists=True):
+        # values 为属性值的元组，顺序与 props 相同，不需要预先转义
+        key = (VERTEX, tag, props, if_not_exists)
+        self._add(key, ((vid,), tuple(values)))[2].append(vid)
+        self.pending_vertices[vid] = key
+
+    def add_edge(self, edge, src_vid, dst_vid, props='', values=(), if_not_exists=True):
+        # 返回是否加入；需要覆盖写入的边不做去重
+        if self.edge_keys is not None and if_not_exists and not self.edge_keys.add(key64(edge, src_vid, dst_vid)):
+            self.duplicate_edges += 1
+            return False
+        group = self._add((EDGE, edge, props, if_not_exists), ((src_vid, dst_vid), tuple(values)))
+        for vid in (src_vid, dst_vid):
+            vertex_key = self.pending_vertices.get(vid)
+            if vertex_key is not None:
+                group[2].add(vertex_key)
+        return True
+
+    def _add(self, key, row):
+        row_bytes = _row_bytes(row)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = [[], 0, [] if key[0] == VERTEX else set()]
+        # 当前分组放不下这一行时先封装成一个批次
+        if group[0] and (len(group[0]) >= self.max_rows or group[1] + row_bytes > self.max_bytes):
+            self._seal_group(key, group)
+        group[0].append(row)
+        group[1] += row_bytes
+        return group
+
+    def _seal_group(self, key, group):
+        kind, name, props, if_not_exists = key
+        if kind == EDGE:
+            # 边批次之前先封装它引用的、尚未封装的顶点分组，保证这些顶点排在它前面
+            for vertex_key in group[2]:
+                vertex_group = self.groups.get(vertex_key)
+                if vertex_group is not None and vertex_group[0]:
+                    self._seal_group(vertex_key, vertex_group)
+            group[2] = set()
+        else:
+            for vid in group[2]:
+                if self.pending_vertices.get(vid) == key:
+                    del self.pending_vertices[vid]
+            group[2] = []
+        self.ready.append(StatementBatch(kind, name, props, group[0], if_not_exists))
+        group[0], group[1] = [], 0
+
+    def _seal(self, kind):
+        for key, group in self.groups.items():
+            if key[0] == kind and group[0]:
+                self._seal_group(key, group)
+
+    def pending_rows(self):
+        return sum(len(b) for b in self.ready) + sum(len(g[0]) for g in self.groups.values())
+
+    def take_ready(self):
+        # 取出已经装满的批次，供流式执行使用；顺序保证每个边批次之前的顶点都已经给出
+        result = self.ready
+        self.ready = []
+        return result
+
+    def batches(self):
+        # 取出所有批次并清空缓存，顶点批次排在边批次之前
+        self._seal(VERTEX)
+        self._seal(EDGE)
+        self.groups = {}
+        self.pending_vertices = {}
+        result = [b for b in self.ready if b.kind == VERTEX] + [b for b in self.ready if b.kind == EDGE]
+        self.ready = []
+        return result
+
+
+# 执行一条语句，可重试的错误按指数退避（带随机抖动）重试。返回 (错误信息或 None, 是否可重试, 执行次数)
+def execute_with_retry(session, stmt, params=None, use_parameters=True, max_attempts=MAX_ATTEMPTS,
+                       initial_delay=RETRY_INITIAL_DELAY, max_delay=RETRY_MAX_DELAY):
+    delay = initial_delay
+    for attempt in range(1, max_attempts + 1):
+        try:
+            result = run_statement(session, stmt, params, use_parameters)
+            if result.is_succeeded():
+                return None, False, attempt
+            error = result.error_msg()
+            retryable = is_retryable(error)
+        except Exception as e:
+            # 连接断开等客户端异常通常是暂时性的
+            error = f"{type(e).__name__}: {e}"
+            retryable = True
+        if not retryable or attempt == max_attempts:
+            return error, retryable, attempt
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay = min(delay * 2, max_delay)
+
+
+# 执行一个批次。暂时性错误先重试；致命错误时对半拆分，直到定位到出错的行。
+# 无法写入的行记录到 dead_letters（DeadLetterFile），返回 (成功行数, 失败行数)
+def execute_batch(session, batch, dead_letters=None, use_parameters=True):
+    error, retryable, attempts = execute_with_retry(session, *batch.statement(), use_parameters)
+    if error is None:
+        return len(batch), 0
+    if len(batch) > 1 and not retryable:
+        left, right = batch.split()
+        ok_left, failed_left = execute_batch(session, left, dead_letters, use_parameters)
+        ok_right, failed_right = execute_batch(session, right, dead_letters, use_parameters)
+        return ok_left + ok_right, failed_left + failed_right
+    # 只打印简短的错误信息，完整的行写入失败记录文件
+    reason = f"重试 {attempts} 次后仍失败" if retryable else "致命错误"
+    print(f"{batch.kind} {batch.name} 的 {len(batch)} 行写入失败（{reason}）: {error[:300]}")
+    if dead_letters is not None:
+        dead_letters.write(batch, error, retryable, attempts)
+    return 0, len(batch)
@@ -0,0 +1,165 @@
+# 多会话并行执行器：从连接池借出多个会话，把批量语句分发到线程池中执行
+import queue
+import threading
+import time
+
+from nebula_batch import VERTEX, execute_batch
+from metrics import InstrumentedSession
+
+
+class Barrier:
+    # 放在批次流中的检查点：之前的所有批次执行完成后，在生产者线程中调用 callback(期间失败的行数)
+    def __init__(self, callback):
+        self.callback = callback
+
+
+class _StreamProgress:
+    # 生产者（语句生成）和消费者（执行线程）共享的进度状态，所有字段都在 cond 保护下修改
+    def __init__(self, source_progress):
+        self.cond = threading.Condition()
+        self.source_progress = source_progress  # 返回输入已消费比例 (0~1) 的函数，用于估算总量
+        self.generated_statements = 0
+        self.generated_rows = 0
+        self.producer_done = False
+        self.statements = 0
+        self.rows = 0
+        self.failed = 0
+        self.vertex_done = set()    # 已完成但尚未连续的顶点批次序号
+        self.vertex_watermark = 0   # 序号小于该值的顶点批次全部完成
+        self.failed_at_barrier = 0  # 上一个检查点时的失败行数
+
+    def estimated_total(self, generated):
+        if self.producer_done or self.source_progress is None:
+            return f"{generated}"
+        fraction = self.source_progress()
+        if fraction <= 0:
+            return f"约 {generated}"
+        return f"约 {max(generated, int(generated / fraction))}"
+
+
+class ParallelExecutor:
+    def __init__(self, connection_pool, space, workers=8, user='root', password='nebula', queue_size=None,
+                 metrics=None, dead_letters=None, use_parameters=True):
+        self.connection_pool = connection_pool
+        self.space = space
+        self.workers = workers
+        self.user = user
+        self.password = password
+        self.queue_size = queue_size or workers * 4  # 待执行批次队列的上限，保证内存占用恒定
+        self.metrics = metrics  # 可选的 Metrics，记录每条语句的延迟
+        self.dead_letters = dead_letters  # 可选的 DeadLetterFile，记录最终无法写入的行
+        self.use_parameters = use_parameters  # 为 False 时参数按字面量代入语句
+        self.sessions = queue.Queue()
+        self.all_sessions = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        # 每个工作线程独占一个会话，会话本身不是线程安全的
+        for _ in range(self.workers):
+            session = self.connection_pool.get_session(self.user, self.password)
+            if self.metrics is not None:
+                session = InstrumentedSession(session, self.metrics)
+            result = session.execute(f'USE {self.space}')
+            if not result.is_succeeded():
+                session.release()
+                raise RuntimeError(f"切换图空间 {self.space} 失败: {result.error_msg()}")
+            self.all_sessions.append(session)
+            self.sessions.put(session)
+
+    def close(self):
+        for session in self.all_sessions:
+            session.release()
+        self.all_sessions = []
+        self.sessions = queue.Queue()
+
+    def _worker(self, work, progress):
+        session = self.sessions.get()
+        try:
+            while True:
+                item = work.get()
+                if item is None:
+                    break
+                batch, vertex_seq, wait_for = item
+                if wait_for:
+                    # 边批次要等它之前生成的所有顶点批次执行完成
+                    with progress.cond:
+                        progress.cond.wait_for(lambda: progress.vertex_watermark >= wait_for)
+                ok, failed = 0, len(batch)
+                try:
+                    ok, failed = execute_batch(session, batch, self.dead_letters, self.use_parameters)
+                finally:
+                    self._finish(progress, batch, vertex_seq, ok, failed)
+        finally:
+            self.sessions.put(session)
+
+    def _finish(self, progress, batch, vertex_seq, ok, failed):
+        with progress.cond:
+            if vertex_seq is not None:
+                progress.vertex_done.add(vertex_seq)
+                while progress.vertex_watermark in progress.vertex_done:
+                    progress.vertex_done.remove(progress.vertex_watermark)
+                    progress.vertex_watermark += 1
+            progress.statements += 1
+            progress.rows += ok + failed
+            progress.failed += failed
+            progress.cond.notify_all()
+            print(f"已执行 {progress.statements} / {progress.estimated_total(progress.generated_statements)} 条语句"
+                  f"（{progress.rows} / {progress.estimated_total(progress.generated_rows)} 行）")
+
+    def _wait_barrier(self, progress, barrier):
+        with progress.cond:
+            progress.cond.wait_for(lambda: progress.statements >= progress.generated_statements)
+            failed = progress.failed - progress.failed_at_barrier
+            progress.failed_at_barrier = progress.failed
+        barrier.callback(failed)
+
+    def execute(self, batches):
+        # 一次性给出的批次列表：顶点批次排在前面，因此所有顶点都会先于任何边写入
+        return self.execute_stream(batches)
+
+    def execute_stream(self, batches, source_progress=None):
+        # 边生成边执行：在当前线程中迭代批次生成器，放入有界队列，由工作线程并发取出执行。
+        # 每个边批次都会等待在它之前生成的顶点批次完成，结果与串行执行一致
+        progress = _StreamProgress(source_progress)
+        work = queue.Queue(maxsize=self.queue_size)
+        threads = [threading.Thread(target=self._worker, args=(work, progress), daemon=True)
+                   for _ in range(self.workers)]
+        print(f"开始执行，使用 {self.workers} 个会话并行写入")
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        vertex_seq = 0
+        try:
+            for batch in batches:
+                if isinstance(batch, Barrier):
+                    self._wait_barrier(progress, batch)
+                    continue
+                with progress.cond:
+                    progress.generated_statements += 1
+                    progress.generated_rows += len(batch)
+                if batch.kind == VERTEX:
+                    work.put((batch, vertex_seq, None))
+                    vertex_seq += 1
+                else:
+                    work.put((batch, None, vertex_seq))
+        finally:
+            with progress.cond:
+                progress.producer_done = True
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"共计 {progress.rows} 行数据，合并为 {progress.statements} 条语句")
+        if progress.failed:
+            print(f"共有 {progress.failed} 行插入失败")
+        if elapsed > 0:
+            print(f"耗时 {elapsed:.2f} 秒，吞吐量 {progress.rows / elapsed:.0f} 行/秒，"
+                  f"{progress.statements / elapsed:.1f} 条语句/秒")
+        return progress.rows - progress.failed, progress.failed
@@ -0,0 +1,169 @@
+# 完整导入流程的统一入口：论文元数据、参考文献和关键技术实体按依赖关系组织成阶段，
+# 互不依赖的阶段在同一个连接池上并发执行，共用解析好的输入、VID登记表和标题索引。
+#   schema ─┐
+#   论文输入 ─┴→ 论文顶点 → 标题索引 → 参考文献 ─┐
+#   实体输入 ──────────────┴→ 实体顶点 ──────────┴→ 实体关联论文 → 校验
+import argparse
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from nebula3.Config import Config
+
+import settings
+from data_in_1 import PaperImport
+from data_in_entity_1 import EntityImport
+from host_pool import BalancedConnectionPool, parse_hosts
+from load_context import LoadContext
+from verify import check
+from schema import PAPER_TAGS, PAPER_EDGES, PAPER_TAG_INDEXES, ENTITY_TAGS, ENTITY_EDGES
+from vid_registry import VID_SCHEMES
+
+
+class Stage:
+    def __init__(self, name, func, after=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+
+
+class Pipeline:
+    # 按依赖关系执行阶段：依赖全部完成的阶段立即提交到线程池。某个阶段失败时，依赖它的阶段不再执行，其余阶段照常完成
+    def __init__(self, stages, workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.workers = workers
+        self.status = {}   # 阶段名 -> 'done' / 'failed' / 'skipped'
+        self.seconds = {}  # 阶段名 -> 用时（秒）
+        for stage in stages:
+            unknown = [name for name in stage.after if name not in self.stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 依赖的阶段不存在: {', '.join(unknown)}")
+
+    def _run_stage(self, stage):
+        start = time.perf_counter()
+        try:
+            stage.func()
+        finally:
+            self.seconds[stage.name] = time.perf_counter() - start
+
+    def run(self):
+        pending = dict(self.stages)
+        running = {}
+        with ThreadPoolExecutor(self.workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    states = [self.status.get(dep) for dep in stage.after]
+                    if any(state in ('failed', 'skipped') for state in states):
+                        print(f"阶段 {name} 依赖的阶段没有完成，跳过")
+                        self.status[name] = 'skipped'
+                        del pending[name]
+                    elif all(state == 'done' for state in states):
+                        print(f"开始阶段 {name}")
+                        running[pool.submit(self._run_stage, stage)] = name
+                        del pending[name]
+                if not running:
+                    if pending:
+                        raise ValueError(f"阶段之间存在循环依赖: {', '.join(pending)}")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        self.status[name] = 'done'
+                        print(f"阶段 {name} 完成，用时 {self.seconds[name]:.1f} 秒")
+                    else:
+                        self.status[name] = 'failed'
+                        print(f"阶段 {name} 失败:")
+                        traceback.print_exception(type(error), error, error.__traceback__)
+        return self.status
+
+    def failed(self):
+        return [name for name, state in self.status.items() if state != 'done']
+
+
+def build_stages(ctx, papers, entities, verify=True):
+    stages = [
+        Stage('schema', ctx.apply_schema),
+        Stage('paper_inputs', papers.load_inputs),
+        Stage('entity_inputs', entities.load_inputs),
+        Stage('paper_vertices', papers.import_metadata, after=('schema', 'paper_inputs')),
+        Stage('title_index', papers.build_title_index, after=('paper_vertices',)),
+        Stage('references', papers.import_references, after=('title_index',)),
+        Stage('entity_vertices', entities.import_vertices, after=('paper_vertices', 'entity_inputs')),
+        # 关联论文的边复用论文阶段的标题索引（包括参考文献阶段查询到的标题），不再重新建立
+        Stage('entity_edges', lambda: entities.import_edges(papers.title_index),
+              after=('references', 'entity_vertices')),
+    ]
+    if verify and ctx.exporter is None:
+        # 所有写入完成后提交一个统计作业，数量不一致时本阶段失败，整个流程以失败结束
+        stages.append(Stage('verify', lambda: check(ctx.verify()), after=('references', 'entity_edges')))
+    return stages
+
+
+def run_pipeline(connection_pool, data_dir=settings.data_dir, space=settings.space, user=settings.user,
+                 password=settings.password, executor_workers=settings.executor_workers,
+                 incremental=settings.incremental, checkpoint_every=settings.checkpoint_every,
+                 metrics_interval=settings.metrics_interval, backend=settings.backend, export_dir=settings.export_dir,
+                 clean_workers=settings.clean_workers, clean_chunk_size=settings.clean_chunk_size,
+                 vid_scheme=settings.vid_scheme, verify=settings.verify):
+    # 论文和实体共用一个图空间定义、一份指标和失败记录；导出模式下写入同一个导出目录和 nebula-importer 配置
+    ctx = LoadContext(connection_pool, data_dir, space, user, password, {**PAPER_TAGS, **ENTITY_TAGS},
+                      {**PAPER_EDGES, **ENTITY_EDGES}, PAPER_TAG_INDEXES, backend=backend, export_dir=export_dir,
+                      executor_workers=executor_workers, vid_scheme=vid_scheme, metrics_name='pipeline',
+                      metrics_interval=metrics_interval, config_name='pipeline_importer.yaml',
+                      verify_timeout=settings.verify_timeout,
+                      batch_max_rows=settings.batch_max_rows, batch_max_bytes=settings.batch_max_bytes,
+                      use_parameters=settings.use_parameters)
+    papers = PaperImport(ctx, incremental, checkpoint_every, clean_workers, clean_chunk_size)
+    entities = EntityImport(ctx)
+    # CSV 导出器不是线程安全的，导出模式下各阶段依次执行
+    pipeline = Pipeline(build_stages(ctx, papers, entities, verify), workers=1 if ctx.exporter is not None else 4)
+    try:
+        pipeline.run()
+    finally:
+        ctx.close()
+    failed = pipeline.failed()
+    if failed:
+        raise RuntimeError(f"导入流程未完成，失败或跳过的阶段: {', '.join(failed)}")
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入论文、参考文献和关键技术实体，互不依赖的阶段并发执行")
+    parser.add_argument('--data-dir', default=settings.data_dir, help="输入文件和导入状态文件所在目录")
+    parser.add_argument('--hosts', default=','.join(f'{h}:{p}' for h, p in settings.graphd_hosts),
+                        help="graphd 地址，逗号分隔，例如 host1:9669,host2:9669")
+    parser.add_argument('--space', default=settings.space, help="图空间名称")
+    parser.add_argument('--user', default=settings.user)
+    parser.add_argument('--password', default=settings.password)
+    parser.add_argument('--workers', type=int, default=settings.executor_workers, help="每个阶段并行写入的会话数")
+    parser.add_argument('--clean-workers', type=int, default=settings.clean_workers, help="文本清理进程数")
+    parser.add_argument('--backend', choices=('nebula', 'csv'), default=settings.backend, help="输出方式")
+    parser.add_argument('--export-dir', default=settings.export_dir, help="CSV 导出目录")
+    parser.add_argument('--vid-scheme', choices=VID_SCHEMES, default=settings.vid_scheme, help="VID 方案")
+    parser.add_argument('--full', action='store_true', help="全量导入，不跳过输入指纹未变化的论文")
+    parser.add_argument('--no-verify', action='store_true', help="导入后不提交统计作业校验各标签/边类型的数量")
+    args = parser.parse_args()
+
+    options = dict(data_dir=args.data_dir, space=args.space, user=args.user, password=args.password,
+                   executor_workers=args.workers, incremental=settings.incremental and not args.full,
+                   backend=args.backend, export_dir=args.export_dir, clean_workers=args.clean_workers,
+                   vid_scheme=args.vid_scheme, verify=settings.verify and not args.no_verify)
+    if args.backend == 'csv':
+        # 导出模式不需要连接图数据库
+        run_pipeline(None, **options)
+        return
+    config = Config()
+    # 最多两个写入阶段同时执行，每个阶段有 workers 个写入会话和一个主会话
+    config.max_connection_pool_size = max(settings.max_connection_pool_size, 2 * (args.workers + 1) + 2)
+    connection_pool = BalancedConnectionPool(parse_hosts(args.hosts), config)
+    try:
+        run_pipeline(connection_pool, **options)
+        connection_pool.print_summary()
+    finally:
+        connection_pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# 向量化预处理：用按列的 str 操作代替逐行 iterrows() 和逐单元格的正则函数；
+# 无法向量化的逐篇文本清理（摘要、作者、单位、基金、参考文献标题）按块分发到进程池
+import multiprocessing
+import re
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from checkpoint import row_fingerprint
+
+# 多值字段的分隔符
+MULTI_VALUE_SEPARATORS = r'[；;，,、]'
+
+
+# 与 preprocess_string 等价的按列版本：空值或"无"变为空字符串，去除首尾空白
+def preprocess_column(column):
+    empty = column.isna() | (column == "无")
+    result = column.astype(str).str.strip()
+    return result.mask(empty, "")
+
+
+# 提取页数字段中的第一个数字，没有数字时为 "0"
+def extract_page_numbers(column):
+    return column.astype(str).str.extract(r'(\d+)', expand=False).where(column.notna()).fillna("0")
+
+
+# 把多值字段拆分成 (row, name) 长表，row 为原表的行索引，顺序与原字段一致
+def explode_multi_values(column, separators=MULTI_VALUE_SEPARATORS):
+    valid = column[column.notna() & (column != "无")].astype(str)
+    values = valid.str.split(separators, regex=True).explode().str.strip()
+    values = values[values.notna() & (values != "")]
+    return pd.DataFrame({'row': values.index, 'name': values.values})
+
+
+# 按行聚合长表，得到 行索引 -> 名称列表，供逐篇生成语句时使用
+def group_by_row(long_frame):
+    return long_frame.groupby('row', sort=False)['name'].agg(list).to_dict()
+
+
+# 论文信息表的预处理：返回规范化后的论文表和各个多值字段的长表
+def preprocess_papers(data_df):
+    papers = pd.DataFrame({
+        'title': preprocess_column(data_df['论文标题']),
+        'abstract': preprocess_column(data_df['摘要']),
+        'release_time': preprocess_column(data_df['发表时间']),
+        'downloads': preprocess_column(data_df['下载量']),
+        'pages': extract_page_numbers(data_df['页数']),
+        'citations': data_df['引用量'],
+        'journal': preprocess_column(data_df['期刊名称']),
+    }, index=data_df.index)
+    multi_values = {
+        'key_word': explode_multi_values(data_df['关键词']),
+        'classification': explode_multi_values(data_df['分类号']),
+        'topic': explode_multi_values(data_df['专题']),
+        'album': explode_multi_values(data_df['专辑']),
+    }
+    return papers, multi_values
+
+
+# 实体表的预处理：返回规范化后的实体表和 (row, name) 形式的关联论文长表
+def preprocess_entities(data_df):
+    entities = pd.DataFrame({
+        'entity_name': preprocess_column(data_df['实体']),
+        'sensitive': data_df['分数'].fillna(0).astype(int),
+    }, index=data_df.index)
+    # 清理格式：移除多余的引号、方括号和其他干扰字符，再按逗号分割
+    related = preprocess_column(data_df['关联论文']).str.replace(r'[\[\]"\']', '', regex=True)
+    titles = related.str.split(',').explode().str.strip()
+    titles = titles[titles.notna() & (titles != "")]
+    related_papers = pd.DataFrame({'row': titles.index, 'name': titles.values})
+    return entities, related_papers
+
+
+# 清理文本时删除的不可见字符，模块导入时编译，每个工作进程只编译一次
+_INVISIBLE_CHARS = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]')
+
+
+def read_paper_info(paper):
+    try:
+
+        # Extract the required sections
+        paper_info = {
+            "题目": paper.get("题目", ""),
+            "作者": paper.get("作者", []),
+            "基金资助": paper.get("基金资助", []),
+            "参考文献": paper.get("参考文献", [])
+        }
+        
+        return paper_info
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+
+# 预处理函数：空值或"无"变为空字符串，去除首尾空白。值作为语句参数传递，转义统一在 nebula_batch.literal 中处理
+def preprocess_string(s):
+    if pd.isna(s) or s == "无":
+        return ""
+    return str(s).strip()
+
+
+# 添加字符串清理函数
+def clean_text_for_nebula(text):
+    try:
+        # 尝试解码和重新编码以删除无效字符
+        text = text.encode('utf-8', 'ignore').decode('utf-8')
+        
+        # 规范化 Unicode
+        text = unicodedata.normalize('NFKC', text)
+        
+        # 删除可能导致问题的不可见字符
+        text = _INVISIBLE_CHARS.sub('', text)
+        
+        return text
+    except Exception as e:
+        print(f"清理文本时出错: {e}")
+        # 如果处理失败，返回安全的空字符串
+        return ""
+
+
+# 一篇论文需要的全部清理结果：(输入指纹, 摘要, [(基金名称, 项目号)], [(作者姓名, [单位])], [参考文献标题])。
+# 参考文献标题在同一次解析中得到，参考文献阶段不需要再读取和解析 output.json
+def prepare_paper(item):
+    raw_row, paper_row, abstract = item
+    paper_info = read_paper_info(paper_row)
+    funds = []
+    if '基金资助' in paper_info and paper_info['基金资助']:
+        for fund in paper_info['基金资助']:
+            funds.append((preprocess_string(fund.get('项目名称', '')), preprocess_string(fund.get('项目号', ''))))
+    authors = []
+    if '作者' in paper_info and paper_info['作者']:
+        for author in paper_info['作者']:
+            authors.append((preprocess_string(author.get('姓名', '')),
+                            [preprocess_string(org_name) for org_name in author.get('单位', [])]))
+    references = []
+    if '参考文献' in paper_info and paper_info['参考文献']:
+        references = [preprocess_string(ref.get('题目', '')) for ref in paper_info['参考文献']]
+    return row_fingerprint(raw_row, paper_row), clean_text_for_nebula(abstract), funds, authors, references
+
+
+def _map_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+# 按块把 func 分发到进程池，结果按输入顺序逐个交出。同时在途的块数有上限，内存占用与输入总量无关。
+# workers 不大于 1 时在当前进程中串行执行；两种方式调用的是同一个函数，结果完全相同
+def parallel_map(func, items, workers=0, chunk_size=256):
+    items = iter(items)
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    # 导入时执行线程已经在运行，直接 fork 有死锁风险，改用 forkserver（不支持时用 spawn）启动工作进程
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method)) as pool:
+        pending = deque()
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            pending.append(pool.submit(_map_chunk, func, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
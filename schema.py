@@ -0,0 +1,189 @@
+# 图空间结构的声明与初始化：幂等地创建图空间、标签、边类型和索引，并轮询直到它们真正可用
+import random
+import re
+import time
+
+# 各VID方案对应的 vid_type：哈希VID是定长 16 个字符或 8 字节整数，每个顶点和边的键都比 256 字节短得多
+VID_TYPES = {
+    'registry': 'FIXED_STRING(256)',
+    'hash': 'FIXED_STRING(16)',
+    'int64': 'INT64',
+}
+
+
+def space_options(vid_scheme='registry'):
+    return f'vid_type = {VID_TYPES[vid_scheme]}, partition_num = 10, replica_factor = 1'
+
+
+# 图空间参数
+SPACE_OPTIONS = space_options()
+
+
+# 图空间是否使用整数VID；整数VID的图空间中语句里的 VID 不能是字符串，反之亦然
+def vid_is_int(space_options):
+    return re.search(r'vid_type\s*=\s*INT64\b', space_options, re.I) is not None
+
+# 论文导入使用的标签、边类型和索引
+PAPER_TAGS = {
+    'paper': 'title string, abstract string, release_time string, download_times int, page int, quote_times int',
+    'journal': 'name string',
+    'author': 'name string',
+    'organization': 'name string',
+    'key_word': 'name string',
+    'classification_number': 'name string',
+    'topic': 'name string',
+    'album': 'name string',
+    'fund': 'name string, fund_number string',
+}
+PAPER_EDGES = {
+    'which_journal': '',
+    'which_author': '',
+    'which_organization': '',
+    'which_key_word': '',
+    'which_classification_number': '',
+    'which_topic': '',
+    'which_album': '',
+    'which_fund': '',
+    'which_reference': '',
+    'taking_office': '',
+}
+# 标题和参考文献按 paper.title == ... 查询，需要标题上的索引；全量扫描 paper 顶点也使用这个索引。
+# 已有的图空间中不会修改同名索引的定义，所以使用新的索引名
+PAPER_TAG_INDEXES = {
+    'i_paper_title': ('paper', 'title(256)'),
+}
+
+# 关键技术实体导入使用的标签和边类型
+ENTITY_TAGS = {
+    'sensitive_entity': 'entity_name string, sensitive int',
+}
+ENTITY_EDGES = {
+    'related_to_paper': '',
+}
+
+
+# 创建整个图空间结构的语句列表，供离线导入工具的配置使用（不等待，不重建索引）
+def schema_statements(space, tags=None, edges=None, tag_indexes=None, space_options=SPACE_OPTIONS):
+    statements = [f'CREATE SPACE IF NOT EXISTS {space} ({space_options})', f'USE {space}']
+    statements += [f'CREATE TAG IF NOT EXISTS {tag}({props})' for tag, props in (tags or {}).items()]
+    statements += [f'CREATE EDGE IF NOT EXISTS {edge}({props})' for edge, props in (edges or {}).items()]
+    statements += [f'CREATE TAG INDEX IF NOT EXISTS {index} ON {tag}({fields})'
+                   for index, (tag, fields) in (tag_indexes or {}).items()]
+    return statements
+
+
+# 按指数退避（带随机抖动）轮询 check()，直到返回真值或超时
+def wait_until(check, description, timeout=120, initial_delay=0.5, max_delay=8):
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        result = check()
+        if result:
+            return result
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"等待{description}超时（{timeout} 秒）")
+        time.sleep(min(delay, max(0, deadline - time.monotonic())) * random.uniform(0.8, 1.2))
+        delay = min(delay * 2, max_delay)
+
+
+class SchemaBootstrap:
+    def __init__(self, session, space, tags=None, edges=None, tag_indexes=None,
+                 space_options=SPACE_OPTIONS, timeout=120):
+        self.session = session
+        self.space = space
+        self.tags = tags or {}
+        self.edges = edges or {}
+        self.tag_indexes = tag_indexes or {}
+        self.space_options = space_options
+        self.timeout = timeout
+
+    def _execute(self, stmt):
+        result = self.session.execute(stmt)
+        if not result.is_succeeded():
+            raise RuntimeError(f"执行失败: {stmt}\n错误信息: {result.error_msg()}")
+        return result
+
+    def _succeeds(self, stmt):
+        return self.session.execute(stmt).is_succeeded()
+
+    def _wait(self, check, description):
+        start = time.monotonic()
+        wait_until(check, description, timeout=self.timeout)
+        print(f"{description}已就绪，用时 {time.monotonic() - start:.1f} 秒")
+
+    def space_exists(self):
+        result = self._execute('SHOW SPACES')
+        return self.space in [record.values()[0].as_string() for record in result]
+
+    def _check_vid_type(self):
+        # 已有图空间的 vid_type 无法修改，与当前VID方案不一致时直接报错，而不是在写入时逐条失败
+        match = re.search(r'vid_type\s*=\s*([\w()]+)', self.space_options, re.I)
+        result = self._execute(f'DESCRIBE SPACE {self.space}')
+        if match is None or 'Vid Type' not in result.keys():
+            return
+        actual = result.column_values('Vid Type')[0].as_string()
+        if actual.replace(' ', '').upper() != match.group(1).upper():
+            raise RuntimeError(f"图空间 {self.space} 的 vid_type 为 {actual}，与当前VID方案需要的 {match.group(1)} 不一致，"
+                               f"请更换VID方案或使用新的图空间")
+
+    def index_status(self):
+        # 返回 索引名 -> 重建状态（FINISHED / RUNNING / FAILED ...）
+        result = self._execute('SHOW TAG INDEX STATUS')
+        return {record.values()[0].as_string(): record.values()[1].as_string() for record in result}
+
+    def apply(self):
+        created_space = not self.space_exists()
+        if created_space:
+            print(f"创建新的图空间: {self.space}")
+            self._execute(f'CREATE SPACE IF NOT EXISTS {self.space} ({self.space_options})')
+        else:
+            print(f"图空间 {self.space} 已存在，将直接使用。")
+            self._check_vid_type()
+        # 新建的图空间要等元数据同步到 graphd 后才能 USE
+        self._wait(lambda: self.space_exists() and self._succeeds(f'USE {self.space}'), f"图空间 {self.space} ")
+
+        for tag, props in self.tags.items():
+            self._execute(f'CREATE TAG IF NOT EXISTS {tag}({props})')
+        for edge, props in self.edges.items():
+            self._execute(f'CREATE EDGE IF NOT EXISTS {edge}({props})')
+        # DESCRIBE 成功只说明 meta 中已有定义，再用一条读取语句确认 graphd 已经能使用该 schema；
+        # 读取语句中的 VID 要与图空间的 vid_type 一致，否则无论 schema 是否可用都会失败
+        vid = '0' if vid_is_int(self.space_options) else '""'
+        self._wait(lambda: all(self._succeeds(f'DESCRIBE TAG {tag}')
+                               and self._succeeds(f'FETCH PROP ON {tag} {vid} YIELD vertex AS v') for tag in self.tags)
+                   and all(self._succeeds(f'DESCRIBE EDGE {edge}')
+                           and self._succeeds(f'FETCH PROP ON {edge} {vid}->{vid} YIELD edge AS e')
+                           for edge in self.edges),
+                   "标签和边类型")
+
+        if not self.tag_indexes:
+            return
+        status = self.index_status()
+        for index, (tag, fields) in self.tag_indexes.items():
+            self._execute(f'CREATE TAG INDEX IF NOT EXISTS {index} ON {tag}({fields})')
+        self._wait(lambda: all(self._succeeds(f'DESCRIBE TAG INDEX {index}') for index in self.tag_indexes), "索引")
+        # 已有的图空间可能已经有数据，索引不是在数据之前建好的就需要重建，否则 LOOKUP 查不到旧数据
+        to_rebuild = [index for index in self.tag_indexes
+                      if not created_space and status.get(index) != 'FINISHED']
+        for index in to_rebuild:
+            print(f"重建索引 {index}")
+            self._execute(f'REBUILD TAG INDEX {index}')
+        self._wait(lambda: self._indexes_usable(to_rebuild), "索引重建")
+
+    def _indexes_usable(self, rebuilt):
+        status = self.index_status()
+        for index in rebuilt:
+            if status.get(index) == 'FAILED':
+                raise RuntimeError(f"索引 {index} 重建失败")
+        if any(status.get(index) != 'FINISHED' for index in rebuilt):
+            return False
+        return all(self._succeeds(self._index_probe(tag, fields)) for tag, fields in self.tag_indexes.values())
+
+    def _index_probe(self, tag, fields):
+        # 与导入时相同形状的查询：按索引的第一个属性做等值查询，没有属性的索引只能扫描
+        field = fields.split(',')[0].split('(')[0].strip()
+        if not field:
+            return f'LOOKUP ON {tag} YIELD id(vertex) | LIMIT 1'
+        props = dict(p.split()[:2] for p in self.tags.get(tag, '').split(',') if p.strip())
+        value = '""' if props.get(field, 'string').startswith(('string', 'fixed_string')) else '0'
+        return f'LOOKUP ON {tag} WHERE {tag}.{field} == {value} YIELD id(vertex)'
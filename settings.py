@@ -0,0 +1,46 @@
+# 导入流程的配置。两个导入脚本和 pipeline.py 都从这里读取默认值，pipeline.py 的命令行参数可以覆盖
+
+# graphd 地址列表，可以配置多个，写入按各主机的负载分配
+graphd_hosts = [('127.0.0.1', 9669)]
+# 图空间名称和账号
+space = 'test_paperdata'
+user = 'root'
+password = 'nebula'
+# 每个 graphd 的最大连接数。流水线中并发的阶段各自占用 executor_workers 个会话，另外每个阶段还有一个主会话
+max_connection_pool_size = 10
+
+# 输入文件和导入状态文件（VID登记表、检查点、标题索引、报告）所在目录
+data_dir = '/root/VscodeProject/PythonProject/nebula_data'
+# data_dir 中的输入文件
+paper_excel = '论文信息表_1.xlsx'
+paper_json = 'output.json'
+entity_excel = '实体.xlsx'
+
+# 增量导入：跳过输入指纹未变化的论文，内容有变化的论文覆盖写入
+incremental = True
+# 每处理 checkpoint_every 篇论文确认一次写入结果并保存检查点
+checkpoint_every = 1000
+executor_workers = 8 # 并行写入的会话数，需小于最大连接数（主会话占用一个）
+# 每条 INSERT 语句最多合并的行数和字节数，失败时自动拆分定位出错的行
+batch_max_rows = 500
+batch_max_bytes = 1024 * 1024
+# VID 和属性值作为参数执行，同一形状的批次共用语句模板。启动时各探测一次参数化的写入和查询，
+# 服务端或客户端不支持时自动改为把参数按字面量写入语句；为 False 时始终使用字面量
+use_parameters = True
+# 摘要、作者、单位、基金和参考文献标题的清理分发到多少个进程，不大于 1 时在主进程中串行清理
+clean_workers = 4
+# 每次分发给清理进程的论文篇数
+clean_chunk_size = 256
+# 运行期间每隔多少秒写一次指标快照，0 表示只在结束时写
+metrics_interval = 0
+# 输出方式：'nebula' 直接执行语句写入图数据库；'csv' 导出每个标签/边类型一个 CSV 文件和 nebula-importer 配置
+backend = 'nebula'
+# CSV 导出目录，为 None 时使用 data_dir 下的 csv_export
+export_dir = None
+# VID 方案：'registry' 登记表顺序编号；'hash' 由名称哈希得到的 16 位字符串；'int64' 哈希得到的整数VID。
+# 两个导入脚本必须使用相同的方案，而且只能在创建图空间时选定
+vid_scheme = 'registry'
+# 导入完成后提交一个统计作业，把各标签/边类型的数量与本地生成的行数比较，不一致时以失败退出
+verify = True
+# 等待统计作业完成的最长时间（秒）
+verify_timeout = 600
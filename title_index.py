@@ -0,0 +1,222 @@
+# 论文标题到VID的本地索引，避免为每条参考文献/关联论文重复执行 LOOKUP 查询。
+# 除原标题外还按规范化标题建索引，全角标点、空格、大小写、末尾句号等细微差异也能直接匹配
+import json
+import os
+import unicodedata
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from nebula_batch import run_statement
+
+
+# 标题的规范形式：NFKC 规范化、大小写折叠，去掉标点、空白和控制字符
+def normalize_title(title):
+    text = unicodedata.normalize('NFKC', title).casefold()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'PZC')
+
+
+_PRIME = (1 << 31) - 1
+
+
+# 查询结果中的VID，INT64 图空间中是整数
+def _vid(value):
+    return value.as_int() if value.is_int() else value.as_string()
+
+
+class MinHashIndex:
+    # 近似重复标题的候选索引：规范化标题的字符 n-gram 做 MinHash 签名，签名按带（band）分桶，
+    # 查询时只和落在同一个桶里的标题比较，不需要两两比较全部标题
+    def __init__(self, ngram=3, bands=8, rows=4, seed=1):
+        rng = np.random.RandomState(seed)
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = rows
+        self.a = rng.randint(1, _PRIME, size=bands * rows).astype(np.int64)
+        self.b = rng.randint(0, _PRIME, size=bands * rows).astype(np.int64)
+        self.buckets = {}  # 带签名的哈希 -> [标题序号]
+        self.titles = []   # 序号 -> (原标题, 值)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def shingles(self, normalized):
+        if len(normalized) <= self.ngram:
+            return {normalized}
+        return {normalized[i:i + self.ngram] for i in range(len(normalized) - self.ngram + 1)}
+
+    def _band_keys(self, shingles):
+        x = np.fromiter((zlib.crc32(s.encode('utf-8')) & _PRIME for s in shingles), dtype=np.int64, count=len(shingles))
+        # 每个哈希函数为 (a*x + b) mod p，签名取各 n-gram 的最小值；x、a 都小于 2^31，乘积不会溢出
+        signature = ((np.outer(x, self.a) + self.b) % _PRIME).min(axis=0)
+        return [hash((band, signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+                for band in range(self.bands)]
+
+    def add(self, title, value):
+        normalized = normalize_title(title)
+        if not normalized:
+            return
+        i = len(self.titles)
+        self.titles.append((title, value))
+        for key in self._band_keys(self.shingles(normalized)):
+            self.buckets.setdefault(key, []).append(i)
+
+    def candidates(self, title, limit=3, threshold=0.5):
+        # 返回 [(标题, 值, Jaccard 相似度)]，按相似度从高到低
+        normalized = normalize_title(title)
+        if not normalized:
+            return []
+        shingles = self.shingles(normalized)
+        ids = set()
+        for key in self._band_keys(shingles):
+            ids.update(self.buckets.get(key, ()))
+        scored = []
+        for i in ids:
+            other_title, value = self.titles[i]
+            other = self.shingles(normalize_title(other_title))
+            similarity = len(shingles & other) / len(shingles | other)
+            if similarity >= threshold:
+                scored.append((similarity, other_title, value))
+        scored.sort(key=lambda s: -s[0])
+        return [(t, v, round(s, 3)) for s, t, v in scored[:limit]]
+
+
+# 按标题查询单篇论文的语句，以及按一组标题批量查询的语句
+TITLE_LOOKUP = 'LOOKUP ON paper WHERE paper.title == $title YIELD id(VERTEX)'
+TITLES_LOOKUP = 'LOOKUP ON paper WHERE paper.title IN $titles YIELD paper.title AS title, id(vertex) AS vid'
+
+
+class TitleIndex:
+    def __init__(self, use_parameters=True):
+        self.use_parameters = use_parameters  # 为 False 时查询参数按字面量代入语句
+        self.vids = {}        # 标题 -> VID
+        self.normalized = {}  # 规范化标题 -> VID；不同论文规范化后相同时为 None，只能按原标题匹配
+        self.missing = set()  # 已确认图中不存在的标题，避免重复查询
+        self.complete = False  # 已完整扫描过图中的 paper 顶点，本地索引中没有的标题就是不存在，不再查询
+        self.lookups = 0      # 实际发往服务端的标题查询次数
+        self.stats = Counter()       # 每次解析的结果：exact / normalized / graph / missing
+        self.unresolved = Counter()  # 未能解析的标题 -> 出现次数
+
+    def __len__(self):
+        return len(self.vids)
+
+    def __contains__(self, title):
+        return self.lookup(title) is not None
+
+    def add(self, title, vid):
+        self.vids[title] = vid
+        self.missing.discard(title)
+        key = normalize_title(title)
+        if key:
+            self.normalized[key] = vid if self.normalized.get(key, vid) == vid else None
+
+    def update(self, items):
+        for title, vid in items:
+            self.add(title, vid)
+
+    def reset_stats(self):
+        # 多个阶段共用同一个索引时，每个阶段的报告只统计本阶段的解析结果；已缓存的VID和不存在的标题保留
+        self.lookups = 0
+        self.stats = Counter()
+        self.unresolved = Counter()
+
+    def save(self, path):
+        # 持久化索引，供实体导入等后续脚本直接使用
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.vids, f, ensure_ascii=False)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            self.update(json.load(f).items())
+        return len(self.vids)
+
+    def load_from_graph(self, session):
+        # 一次扫描全部 paper 顶点（依赖索引 i_paper_title），结果以图中数据为准
+        result = session.execute('LOOKUP ON paper YIELD paper.title AS title, id(vertex) AS vid')
+        if not result.is_succeeded():
+            print(f"批量加载论文标题失败: {result.error_msg()}")
+            return 0
+        titles = result.column_values('title')
+        vids = result.column_values('vid')
+        for title, vid in zip(titles, vids):
+            self.add(title.as_string(), _vid(vid))
+        self.complete = True
+        return len(titles)
+
+    def lookup(self, title):
+        # 只查本地索引：先按原标题，再按规范化标题
+        vid = self.vids.get(title)
+        if vid is None:
+            vid = self.normalized.get(normalize_title(title))
+        return vid
+
+    def resolve(self, session, title):
+        # 先查本地索引，只有真正未知的标题才查询图数据库（完整扫描过图之后不再查询），查询结果（包括未找到）都会缓存
+        vid = self.vids.get(title)
+        if vid is not None:
+            self.stats['exact'] += 1
+            return vid
+        if title not in self.missing:
+            vid = self.normalized.get(normalize_title(title))
+            if vid is not None:
+                self.stats['normalized'] += 1
+                return vid
+            if session is not None and not self.complete:
+                self.lookups += 1
+                result = run_statement(session, TITLE_LOOKUP, {'title': title}, self.use_parameters)
+                if result.is_succeeded() and result.rows():
+                    vid = _vid(result.column_values('id(VERTEX)')[0])
+                    self.add(title, vid)
+                    self.stats['graph'] += 1
+                    return vid
+            self.missing.add(title)
+        self.stats['missing'] += 1
+        self.unresolved[title] += 1
+        return None
+
+    def resolve_many(self, session, titles, chunk_size=200):
+        # 批量解析一组标题：本地（包括规范化标题）未知的标题按块用 IN 条件一次查询，查询不到的记为不存在
+        unknown = [t for t in dict.fromkeys(titles) if t not in self.missing and self.lookup(t) is None]
+        if session is None or self.complete:
+            # 没有连接图数据库（如导出模式）或已完整扫描过图时只使用本地索引
+            self.missing.update(unknown)
+            unknown = []
+        for i in range(0, len(unknown), chunk_size):
+            chunk = unknown[i:i + chunk_size]
+            self.lookups += 1
+            result = run_statement(session, TITLES_LOOKUP, {'titles': chunk}, self.use_parameters)
+            if not result.is_succeeded():
+                print(f"批量查询论文标题失败: {result.error_msg()}")
+                continue
+            for title, vid in zip(result.column_values('title'), result.column_values('vid')):
+                self.add(title.as_string(), _vid(vid))
+            self.missing.update(t for t in chunk if t not in self.vids)
+        return {t: self.lookup(t) for t in titles if self.lookup(t) is not None}
+
+    def write_report(self, path, candidates=3, threshold=0.5):
+        # 写出解析统计和未解析的标题（按出现次数排序），并为每个未解析的标题给出最相近的已知论文作为候选
+        near = MinHashIndex()
+        if self.unresolved and candidates:
+            for title, vid in self.vids.items():
+                near.add(title, vid)
+        report = {
+            'stats': {key: self.stats[key] for key in ('exact', 'normalized', 'graph', 'missing')},
+            'distinct_unresolved': len(self.unresolved),
+            'graph_lookups': self.lookups,
+            'unresolved': [
+                {'title': title, 'occurrences': n,
+                 'candidates': [{'title': t, 'vid': v, 'similarity': s}
+                                for t, v, s in (near.candidates(title, candidates, threshold) if len(near) else [])]}
+                for title, n in self.unresolved.most_common()
+            ],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with_candidates = sum(1 for item in report['unresolved'] if item['candidates'])
+        print(f"标题解析: 原标题匹配 {self.stats['exact']} 次，规范化标题匹配 {self.stats['normalized']} 次，"
+              f"图中查询命中 {self.stats['graph']} 次，未找到 {self.stats['missing']} 次"
+              f"（{len(self.unresolved)} 个不同标题，其中 {with_candidates} 个有近似候选），报告已写入 {path}")
+        return report
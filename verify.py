@@ -0,0 +1,202 @@
+# 导入后的校验：提交一个 STATS 作业，按指数退避轮询 SHOW JOB 直到作业结束，再把 SHOW STATS 中每个标签/边类型的数量
+# 与导入程序本地去重后生成的行数比较。只需要服务端执行一个作业，不需要全图扫描的计数查询
+import json
+import os
+import threading
+
+import numpy as np
+
+from dedup import Int64Set, stable_key64
+from nebula_batch import VERTEX, EDGE
+from nebula_executor import Barrier
+from schema import wait_until
+
+# 作业的结束状态
+_JOB_DONE = ('FINISHED', 'FAILED', 'STOPPED')
+
+
+class ExpectedRows:
+    # 导入程序生成过的顶点和边，每个标签/边类型一个稳定 64 位键的集合（与 IF NOT EXISTS 相同，重复的行只计一次）。
+    # 保存在文件中跨运行累积（全量导入也不清空，导入从不删除图中已有的数据），增量导入跳过的论文仍然计入期望的数量。
+    # 每个检查点分段只把新加入的键追加到日志文件，导入结束或校验前再合并写入 path
+    def __init__(self, path=None):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + '.journal' if path else None
+        self.journal = None
+        self.lock = threading.Lock()
+        self.keys = {}      # (VERTEX|EDGE, 名称) -> Int64Set
+        self.new_keys = {}  # (VERTEX|EDGE, 名称) -> 上次追加到日志之后新加入的键
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                for name in data.files:
+                    kind, _, label = name.partition(':')
+                    self.keys[(kind, label)] = Int64Set(keys=data[name])
+        if self.journal_path and os.path.exists(self.journal_path):
+            # 上次运行中途退出，日志中的键还没有合并，先合并再开始本次运行
+            self._replay_journal()
+            self.save()
+
+    def _replay_journal(self):
+        new_keys = {}
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 退出时正在写入的最后一行不完整，对应的检查点也没有保存，这些行会重新生成
+                    break
+                new_keys.setdefault(record['set'], []).extend(record['keys'])
+        for name, keys in new_keys.items():
+            kind, _, label = name.partition(':')
+            existing = self.keys.get((kind, label))
+            if existing is not None:
+                keys = np.concatenate((existing.to_array(), np.asarray(keys, dtype=np.int64)))
+            self.keys[(kind, label)] = Int64Set(keys=keys)
+
+    def track(self, batches):
+        # 包装批次流：原样交出每个批次，同时记录其中的行。检查点保存之前先把新加入的键追加到日志，
+        # 中途退出后重新运行时，检查点中跳过的论文生成过的行仍然计入期望的数量
+        for batch in batches:
+            if isinstance(batch, Barrier):
+                batch = Barrier(self._appending(batch.callback))
+            else:
+                # 并发的阶段共用这些集合，加入和保存都在锁内进行，保存时不会遇到正在变化的集合
+                new_keys = [stable_key64(*row[0]) for row in batch.rows]
+                with self.lock:
+                    keys = self.keys.setdefault((batch.kind, batch.name), Int64Set())
+                    added = self.new_keys.setdefault((batch.kind, batch.name), [])
+                    for key in new_keys:
+                        if keys.add(key):
+                            added.append(key)
+            yield batch
+
+    def _appending(self, callback):
+        def append_then(failed):
+            self.append()
+            callback(failed)
+        return append_then
+
+    def counts(self):
+        with self.lock:
+            return {key: len(keys) for key, keys in self.keys.items()}
+
+    def append(self):
+        # 把上次追加之后新加入的键写入日志，代价只与这一段的行数有关
+        if not self.path:
+            return
+        with self.lock:
+            if self.journal is None:
+                self.journal = open(self.journal_path, 'a', encoding='utf-8')
+            for (kind, name), keys in self.new_keys.items():
+                if keys:
+                    self.journal.write(json.dumps({'set': f'{kind}:{name}', 'keys': keys}) + '\n')
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.new_keys = {}
+
+    def save(self):
+        # 合并全部的键写入 path，之后日志不再需要
+        if not self.path:
+            return
+        with self.lock:
+            arrays = {f'{kind}:{name}': keys.to_array() for (kind, name), keys in self.keys.items()}
+            # 先写临时文件再替换，中途退出不会留下损坏的文件；替换完成后才删除日志
+            tmp_path = self.path + '.tmp.npz'
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self.path)
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.new_keys = {}
+
+
+def _execute(session, stmt):
+    result = session.execute(stmt)
+    if not result.is_succeeded():
+        raise RuntimeError(f"执行失败: {stmt}\n错误信息: {result.error_msg()}")
+    return result
+
+
+def submit_stats_job(session):
+    # 返回作业编号
+    result = _execute(session, 'SUBMIT JOB STATS')
+    return result.column_values(result.keys()[0])[0].as_int()
+
+
+def wait_for_job(session, job_id, timeout=600):
+    # 按指数退避（带抖动）轮询作业状态，返回结束时的状态
+    def status():
+        result = _execute(session, f'SHOW JOB {job_id}')
+        # 第一行是作业本身，之后是各分片的任务
+        state = result.column_values('Status')[0].as_string()
+        return state if state in _JOB_DONE else None
+    return wait_until(status, f"统计作业 {job_id} ", timeout=timeout, initial_delay=0.2)
+
+
+def read_stats(session):
+    # SHOW STATS 的结果：(VERTEX|EDGE, 名称) -> 数量
+    result = _execute(session, 'SHOW STATS')
+    kinds = {'Tag': VERTEX, 'Edge': EDGE}
+    stats = {}
+    for kind, name, count in zip(result.column_values('Type'), result.column_values('Name'),
+                                 result.column_values('Count')):
+        kind = kinds.get(kind.as_string())
+        if kind is not None:
+            stats[(kind, name.as_string())] = count.as_int()
+    return stats
+
+
+def diff_counts(expected, actual, tags=(), edges=()):
+    # 给出 tags/edges 时只比较这些标签/边类型（本地没有生成过行的期望数量为 0），否则比较本地记录的全部类型
+    names = [(VERTEX, name) for name in tags] + [(EDGE, name) for name in edges] or list(expected)
+    mismatches = []
+    for kind, name in names:
+        want = expected.get((kind, name), 0)
+        got = actual.get((kind, name), 0)
+        if want != got:
+            mismatches.append({'type': 'tag' if kind == VERTEX else 'edge', 'name': name,
+                               'expected': want, 'actual': got, 'diff': got - want})
+    return {
+        'ok': not mismatches,
+        'checked': len(names),
+        'expected_vertices': sum(expected.get(key, 0) for key in names if key[0] == VERTEX),
+        'expected_edges': sum(expected.get(key, 0) for key in names if key[0] == EDGE),
+        'mismatches': mismatches,
+    }
+
+
+def verify_load(session, expected, tags=(), edges=(), timeout=600, report_path=None):
+    # 提交统计作业并等待完成，比较 SHOW STATS 与本地期望数量，返回差异报告（也写入 report_path）
+    job_id = submit_stats_job(session)
+    status = wait_for_job(session, job_id, timeout)
+    if status != 'FINISHED':
+        report = {'ok': False, 'job_id': job_id, 'job_status': status, 'mismatches': []}
+    else:
+        report = {'job_id': job_id, 'job_status': status,
+                  **diff_counts(expected, read_stats(session), tags, edges)}
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    return report
+
+
+def print_report(report):
+    if report['job_status'] != 'FINISHED':
+        print(f"统计作业 {report['job_id']} 未完成，状态为 {report['job_status']}，无法校验导入结果")
+        return
+    if report['ok']:
+        print(f"导入校验通过：{report['checked']} 个标签/边类型的数量与本地生成的行数一致"
+              f"（顶点 {report['expected_vertices']}，边 {report['expected_edges']}）")
+        return
+    print(f"导入校验失败：{len(report['mismatches'])} 个标签/边类型的数量不一致")
+    for m in report['mismatches']:
+        print(f"  {m['type']} {m['name']}: 期望 {m['expected']}，图中 {m['actual']}，差 {m['diff']:+d}")
+
+
+def check(report):
+    # 校验失败时抛出异常，作为流水线的门禁；没有校验（导出模式）时直接通过
+    if report is not None and not report['ok']:
+        raise RuntimeError(f"导入校验失败，详见差异报告（统计作业 {report['job_id']}）")
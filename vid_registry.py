@@ -0,0 +1,191 @@
+# 持久化的VID登记表：以 (实体类型, 名称) 为键保存在 SQLite 中，多次运行和多个脚本共用同一套VID。
+# 也可以改用由名称哈希得到的VID（HashVidRegistry），不需要登记，任何进程都能独立算出相同的VID
+import hashlib
+import sqlite3
+import sys
+import threading
+import unicodedata
+
+# VID 方案：'registry' 登记表顺序编号（如 paper01）；'hash' 16 位十六进制字符串；'int64' 整数VID
+VID_SCHEMES = ('registry', 'hash', 'int64')
+
+
+# 计算哈希VID前对名称的规范化：NFKC 规范化，合并连续空白并去除首尾空白
+def normalize_name(name):
+    return ' '.join(unicodedata.normalize('NFKC', name).split())
+
+
+# (实体类型, 规范化名称) 的稳定 64 位哈希，有符号整数。与进程、运行顺序和 Python 的哈希随机化无关；
+# 一千万个名称中出现碰撞的概率约为百万分之三
+def hash_id(entity_type, name):
+    digest = hashlib.blake2b(f'{entity_type}\x1f{normalize_name(name)}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+# 按方案打开VID来源，两种实现的用法相同
+def open_vid_registry(path, scheme='registry'):
+    if scheme == 'registry':
+        return VidRegistry(path)
+    if scheme in ('hash', 'int64'):
+        return HashVidRegistry(int64=scheme == 'int64')
+    raise ValueError(f"未知的VID方案: {scheme}")
+
+
+class VidRegistry:
+    dense = True  # 编号从 1 开始连续分配，可以用位图记录
+
+    def __init__(self, path):
+        # 流水线中并发的阶段共用同一个登记表，连接允许跨线程使用，读写由 lock 串行化
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute('CREATE TABLE IF NOT EXISTS vids ('
+                          'entity_type TEXT NOT NULL, name TEXT NOT NULL, vid TEXT NOT NULL, '
+                          'PRIMARY KEY (entity_type, name))')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS counters (entity_type TEXT PRIMARY KEY, next INTEGER NOT NULL)')
+        self.conn.commit()
+        # entity_type -> {名称: 编号}，避免重复查询 SQLite。只保存驻留后的名称和整数编号，VID 在需要时由编号生成
+        self.cache = {}
+        self.counters = dict(self.conn.execute('SELECT entity_type, next FROM counters'))
+        self.dirty = False  # 是否有尚未提交的新VID
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def format_vid(entity_type, n):
+        return f"{entity_type}{n:02d}"
+
+    def _new_id(self, entity_type):
+        n = self.counters.get(entity_type, 1)
+        self.counters[entity_type] = n + 1
+        return n
+
+    def _cache_vid(self, entity_type, name, vid):
+        # 登记表中的VID都由 format_vid 生成，去掉类型前缀就是编号
+        n = self.cache.setdefault(entity_type, {})[sys.intern(name)] = int(vid[len(entity_type):])
+        return n
+
+    def cached_id(self, entity_type, name):
+        # 只查内存缓存，不查询 SQLite
+        ids = self.cache.get(entity_type)
+        return ids.get(name) if ids is not None else None
+
+    def get_id(self, entity_type, name):
+        n = self.cached_id(entity_type, name)
+        if n is None:
+            with self.lock:
+                row = self.conn.execute('SELECT vid FROM vids WHERE entity_type = ? AND name = ?',
+                                        (entity_type, name)).fetchone()
+                if row is not None:
+                    n = self._cache_vid(entity_type, name, row[0])
+        return n
+
+    def get(self, entity_type, name):
+        n = self.get_id(entity_type, name)
+        return self.format_vid(entity_type, n) if n is not None else None
+
+    def get_or_assign_id(self, entity_type, name):
+        n = self.get_id(entity_type, name)
+        if n is None:
+            with self.lock:
+                # 加锁后再查一次，其他线程可能刚刚分配了同一个名称
+                n = self.get_id(entity_type, name)
+                if n is None:
+                    n = self.cache.setdefault(entity_type, {})[sys.intern(name)] = self._new_id(entity_type)
+                    self.conn.execute('INSERT INTO vids VALUES (?, ?, ?)',
+                                      (entity_type, name, self.format_vid(entity_type, n)))
+                    self.dirty = True
+        return n
+
+    def get_or_assign(self, entity_type, name):
+        return self.format_vid(entity_type, self.get_or_assign_id(entity_type, name))
+
+    def get_or_assign_many(self, entity_type, names, chunk_size=500):
+        with self.lock:
+            return self._get_or_assign_many(entity_type, names, chunk_size)
+
+    def _get_or_assign_many(self, entity_type, names, chunk_size):
+        # 批量版本：已有的名称分块一次查出，其余按出现顺序分配新VID
+        ids = self.cache.setdefault(entity_type, {})
+        names = [n for n in dict.fromkeys(names) if n not in ids]
+        for i in range(0, len(names), chunk_size):
+            chunk = names[i:i + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.conn.execute(f'SELECT name, vid FROM vids WHERE entity_type = ? AND name IN ({placeholders})',
+                                     [entity_type, *chunk])
+            for name, vid in rows:
+                self._cache_vid(entity_type, name, vid)
+        new_rows = []
+        for name in names:
+            if name not in ids:
+                n = ids[sys.intern(name)] = self._new_id(entity_type)
+                new_rows.append((entity_type, name, self.format_vid(entity_type, n)))
+        if new_rows:
+            self.conn.executemany('INSERT INTO vids VALUES (?, ?, ?)', new_rows)
+            self.dirty = True
+        self.commit()
+        return len(new_rows)
+
+    def items(self, entity_type):
+        # 某一类型已登记的全部 (名称, VID)，一次取出，避免其他线程在遍历期间写入
+        with self.lock:
+            return self.conn.execute('SELECT name, vid FROM vids WHERE entity_type = ?', (entity_type,)).fetchall()
+
+    def commit(self):
+        # 在语句发往服务端之前提交，保证图中出现的VID一定已经持久化
+        with self.lock:
+            if self.dirty:
+                self.conn.executemany('INSERT OR REPLACE INTO counters VALUES (?, ?)', self.counters.items())
+                self.conn.commit()
+                self.dirty = False
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.conn.close()
+
+
+class HashVidRegistry:
+    # 无状态的VID：由 hash_id 计算，不查询也不写入任何登记表，可以在多个进程中并行生成。
+    # int64 为 True 时VID是整数（图空间 vid_type = INT64），否则是固定 16 位的十六进制字符串（FIXED_STRING(16)）
+    dense = False  # 编号是 64 位哈希，不能用位图记录
+
+    def __init__(self, int64=False):
+        self.int64 = int64
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def format_vid(self, n):
+        return n if self.int64 else f'{n & 0xFFFFFFFFFFFFFFFF:016x}'
+
+    def get_id(self, entity_type, name):
+        return hash_id(entity_type, name)
+
+    cached_id = get_id
+    get_or_assign_id = get_id
+
+    def get(self, entity_type, name):
+        return self.format_vid(hash_id(entity_type, name))
+
+    get_or_assign = get
+
+    def get_or_assign_many(self, entity_type, names, chunk_size=500):
+        # 不需要预先分配
+        return 0
+
+    def items(self, entity_type):
+        # 不保存名称，没有可以遍历的登记记录
+        return iter(())
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass